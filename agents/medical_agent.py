@@ -2,10 +2,18 @@
 Medical Agent Orchestrator - Dependency Inversion Principle
 """
 
-from typing import Dict, Any, List
+import asyncio
+import queue
+import re
+import threading
+from typing import Callable, Dict, Any, Generator, List, Optional
 from loguru import logger
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.prompts import PromptTemplate
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad import format_log_to_str
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain.agents.output_parsers.react_single_input import FINAL_ANSWER_ACTION
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import render_text_description
 
 from config.settings import settings
 from core.models import QueryResult
@@ -17,26 +25,17 @@ from services.guard_service import GuardService
 from agents.memory import ConversationMemory
 
 # Import tool classes and functions
-from tools.knowledge_search import (
-    KnowledgeSearchTool, 
-    search_medical_knowledge,
-    set_knowledge_tool  # ADD THIS
-)
+from tools.knowledge_search import KnowledgeSearchTool, KnowledgeSearchBatchTool
 from tools.web_search import search_web_medical
-from tools.image_analysis import (
-    ImageAnalysisTool, 
-    analyze_medical_image,
-    set_image_tool  # ADD THIS
-)
+from tools.image_analysis import ImageAnalysisTool
 from tools.medical_calculator import calculate_medical_metric
+from tools.parallel_tools import ParallelToolsTool
 
 
 # Agent Prompt Template
-MEDICAL_REACT_PROMPT = PromptTemplate.from_template("""You are an expert medical AI assistant with specialized tools.
+MEDICAL_REACT_TEMPLATE = """You are an expert medical AI assistant with specialized tools.
 Goal: Provide accurate, evidence-based medical information.
 
-{conversation_context}
-
 AVAILABLE TOOLS:
 {tools}
 
@@ -59,11 +58,14 @@ CONTEXT USAGE:
 
 DECISION GUIDELINES:
 1. **Standard medical questions** → search_medical_knowledge first
+   (several related sub-questions → search_medical_knowledge_batch with a JSON list)
 2. **Recent information (2024-2025)** → search_web_medical directly
 3. **Medical images** → analyze_medical_image (image must be uploaded first)
 4. **Calculations** → calculate_medical_metric
+   (Action Input: {"calculation_type": "BMI", "parameters": {"weight_kg": 70, "height_m": 1.75}})
 5. **Multi-tool strategies** → Combine sources when needed
-6. **Always cite sources** in Final Answer
+6. **Independent lookups** → parallel_tools to run them at the same time
+7. **Always cite sources** in Final Answer
 
 IMPORTANT - IMAGE ANALYSIS:
 - If user asks about an image, X-ray, scan, or radiological analysis
@@ -72,6 +74,11 @@ IMPORTANT - IMAGE ANALYSIS:
 - Action Input should be the analysis query (e.g., "Check for fractures")
 - DO NOT include JSON or image_source in Action Input for analyze_medical_image
 
+IMPORTANT - PARALLEL TOOL CALLS:
+- If you need two or more lookups that do not depend on each other, use parallel_tools
+- Action Input must be JSON: {"calls": [{"tool": "<tool name>", "input": "<tool input>"}, ...]}
+- Do not use parallel_tools when one call needs the result of another
+
 EXAMPLES:
 
 Example 1 - Knowledge Base:
@@ -102,10 +109,59 @@ Observation: [Treatment guidelines]
 Thought: Have treatment information for pneumonia discussed earlier
 Final Answer: For the pneumonia identified in the X-ray, recommended treatments include... [Source: Medical Knowledge Base]
 
+Example 4 - Independent Lookups:
+Question: What is the standard treatment for psoriasis and are there any new 2025 approvals?
+Thought: Textbook treatment and recent approvals are independent, run both at once
+Action: parallel_tools
+Action Input: {"calls": [{"tool": "search_medical_knowledge", "input": "psoriasis treatment guidelines"}, {"tool": "search_web_medical", "input": "psoriasis new FDA approvals 2025"}]}
+Observation: [Knowledge base results and web results]
+Thought: Have both standard and recent information
+Final Answer: Standard psoriasis treatment includes... Recently approved options include... [Source: Medical Knowledge Base, Web Search]
+
 Begin!
 
+{conversation_context}
+
 Question: {input}
-Thought: {agent_scratchpad}""")
+Thought: {agent_scratchpad}"""
+
+# Split once at import on the per-turn fields; {tools}/{tool_names} stay
+# in the static parts and are bound per agent by compile_react_prompt.
+# Per-turn fields all sit after the static instructions and examples so
+# the provider's cached prompt prefix survives context changes.
+_TEMPLATE_HEAD, _rest = MEDICAL_REACT_TEMPLATE.split("{conversation_context}")
+_TEMPLATE_MID, _rest = _rest.split("{input}")
+_TEMPLATE_TAIL, _TEMPLATE_END = _rest.split("{agent_scratchpad}")
+
+# Queries routed to the image or calculator tools; a knowledge base
+# prefetch for these would almost never be used
+_NO_PREFETCH_RE = re.compile(
+    r"\b(image|x-?ray|scan|ct|mri|ultrasound|radiolog\w*|uploaded"
+    r"|bmi|egfr|calculat\w*|compute)\b",
+    re.IGNORECASE
+)
+
+
+def compile_react_prompt(tools: str, tool_names: str) -> Callable[[str, str, str], str]:
+    """
+    Bind the session-constant tool fields into the ReAct template
+    
+    Args:
+        tools: Rendered tool descriptions
+        tool_names: Comma-separated tool names
+        
+    Returns:
+        Renderer taking (conversation_context, input, agent_scratchpad)
+    """
+    head, mid, tail, end = (
+        part.replace("{tools}", tools).replace("{tool_names}", tool_names)
+        for part in (_TEMPLATE_HEAD, _TEMPLATE_MID, _TEMPLATE_TAIL, _TEMPLATE_END)
+    )
+    
+    def render(conversation_context: str, input: str, agent_scratchpad: str) -> str:
+        return head + conversation_context + mid + input + tail + agent_scratchpad + end
+    
+    return render
 
 
 class MedicalAgent:
@@ -137,35 +193,45 @@ class MedicalAgent:
         self.image_handler = image_handler
         self.llm_service = llm_service
         
-        # Initialize tool instances
+        # Initialize tool instances (bound to this agent, not module globals)
         self.knowledge_tool = KnowledgeSearchTool(knowledge_service)
         self.image_tool = ImageAnalysisTool(image_handler, llm_service)
         
-        # SET GLOBAL INSTANCES - THIS IS THE FIX! ✅
-        set_knowledge_tool(self.knowledge_tool)
-        set_image_tool(self.image_tool)
-        
-        # LangChain tool functions
-        self.tools = [
-            search_medical_knowledge,
+        # LangChain tools
+        base_tools = [
+            self.knowledge_tool.as_langchain_tool(),
+            KnowledgeSearchBatchTool(self.knowledge_tool).as_langchain_tool(),
             search_web_medical,
-            analyze_medical_image,
+            self.image_tool.as_langchain_tool(),
             calculate_medical_metric
         ]
         
+        # Meta-tool for dispatching independent calls concurrently
+        self.parallel_tool = ParallelToolsTool(base_tools)
+        self.tools = base_tools + [self.parallel_tool.as_langchain_tool()]
+        
         # Initialize guard
         self.enable_guard = enable_guard
         if enable_guard:
-            self.guard_service = GuardService(llm_service)
+            self.guard_service = GuardService(llm_service, knowledge_service.embedding_service)
         
         # Initialize memory
-        self.memory = ConversationMemory()
+        self.memory = ConversationMemory(llm_service=llm_service)
         
-        # Create agent
-        self.agent = create_react_agent(
-            llm=llm_service.get_langchain_llm(),
-            tools=self.tools,
-            prompt=MEDICAL_REACT_PROMPT
+        # Create agent (same pipeline as create_react_agent, with the
+        # prompt pre-bound instead of re-formatted on every ReAct step)
+        render_prompt = compile_react_prompt(
+            tools=render_text_description(self.tools),
+            tool_names=", ".join(t.name for t in self.tools)
+        )
+        self.agent = (
+            RunnableLambda(lambda x: render_prompt(
+                x["conversation_context"],
+                x["input"],
+                format_log_to_str(x["intermediate_steps"])
+            ))
+            | llm_service.get_langchain_llm().bind(stop=["\nObservation"])
+            | ReActSingleInputOutputParser()
         )
         
         # Create executor
@@ -182,20 +248,106 @@ class MedicalAgent:
     
     def query(self, question: str, skip_guard: bool = False) -> QueryResult:
         """
-        Process user query
+        Process user query (blocking wrapper around aquery)
         
         Args:
             question: User's medical question
             skip_guard: Skip guard validation
             
+        Returns:
+            Query result with response and metadata
+        """
+        return asyncio.run(self.aquery(question, skip_guard))
+    
+    def stream_query(
+        self,
+        question: str,
+        skip_guard: bool = False,
+        on_result: Optional[Callable[[QueryResult], None]] = None
+    ) -> Generator[str, None, QueryResult]:
+        """
+        Process user query, yielding the final answer as it is generated
+        
+        The agent runs on a worker thread; tool-use steps are not streamed.
+        If no answer text was streamed (guard rejection, error), the final
+        response is yielded whole.
+        
+        Args:
+            question: User's medical question
+            skip_guard: Skip guard validation
+            on_result: Called from the worker thread with the final result,
+                even if the consumer stops iterating before the stream ends
+            
+        Yields:
+            Final-answer text chunks
+            
+        Returns:
+            Query result (the generator's return value)
+        """
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+        outcome: Dict[str, Any] = {}
+        
+        def run():
+            try:
+                outcome["result"] = asyncio.run(
+                    self.aquery(question, skip_guard, on_token=chunks.put)
+                )
+            except BaseException as e:
+                outcome["error"] = e
+                outcome["result"] = QueryResult(
+                    response=f"Error processing query: {str(e)}",
+                    success=False,
+                    metadata={"error": str(e)}
+                )
+            finally:
+                if on_result is not None:
+                    on_result(outcome["result"])
+                chunks.put(done)
+        
+        threading.Thread(target=run, name="agent-stream", daemon=True).start()
+        
+        streamed = False
+        while (chunk := chunks.get()) is not done:
+            streamed = True
+            yield chunk
+        
+        if "error" in outcome:
+            raise outcome["error"]
+        result = outcome["result"]
+        if not streamed:
+            yield result.response
+        return result
+    
+    async def aquery(
+        self,
+        question: str,
+        skip_guard: bool = False,
+        memory: Optional[ConversationMemory] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> QueryResult:
+        """
+        Process user query asynchronously
+        
+        Args:
+            question: User's medical question
+            skip_guard: Skip guard validation
+            memory: Conversation memory to read/write (defaults to the agent's)
+            on_token: Called with each chunk of the final answer as the LLM
+                generates it (the returned result still carries the full text)
+            
         Returns:
             Query result with response and metadata
         """
         logger.info(f"Processing query: {question[:50]}...")
+        memory = memory or self.memory
+        generation = memory.generation
         
-        # Guard validation
+        # Guard validation (may call the LLM, so keep it off the event loop)
         if self.enable_guard and not skip_guard:
-            is_valid, reason = self.guard_service.is_medical_query(question)
+            is_valid, reason = await asyncio.to_thread(
+                self.guard_service.is_medical_query, question
+            )
             
             if not is_valid:
                 logger.warning(f"Query rejected: {reason}")
@@ -206,17 +358,25 @@ class MedicalAgent:
                     rejection_reason=reason
                 )
         
+        # Speculatively start the knowledge base search while the LLM decodes
+        if not _NO_PREFETCH_RE.search(question):
+            self.knowledge_tool.prefetch(question)
+        
         # Get conversation context
-        context = self.memory.get_recent_context(n=3)
+        context = memory.get_recent_context(n=3)
         image_context = self._get_image_context()
         
         try:
             # Execute agent
-            result = self.agent_executor.invoke({
+            inputs = {
                 "input": question,
                 "image_context": image_context,
                 "conversation_context": context
-            })
+            }
+            if on_token is None:
+                result = await self.agent_executor.ainvoke(inputs)
+            else:
+                result = await self._astream_final_answer(inputs, on_token)
             
             # Extract tool usage
             tool_usage = {}
@@ -229,7 +389,7 @@ class MedicalAgent:
             tools_used = list(tool_usage.keys())
             
             # Save to memory
-            self.memory.add_exchange(question, response_text, tools_used)
+            memory.add_exchange(question, response_text, tools_used, generation=generation)
             
             logger.success(f"Query processed. Tools used: {tools_used}")
             
@@ -246,7 +406,7 @@ class MedicalAgent:
             logger.error(error_message)
             
             # Save error to memory
-            self.memory.add_exchange(question, error_message, [])
+            memory.add_exchange(question, error_message, [], generation=generation)
             
             return QueryResult(
                 response=error_message,
@@ -254,22 +414,84 @@ class MedicalAgent:
                 rejected=False,
                 metadata={"error": str(e)}
             )
-    def _get_image_context(self) -> str:
-        if self.image_handler.has_pending_image():
-            uploaded_keys = list(self.image_handler.uploaded_images.keys())
-            if uploaded_keys:
-                filename = uploaded_keys[-1]
-                img_info = self.image_handler.uploaded_images[filename]
-                metadata = img_info.get('metadata')
+        
+        finally:
+            self.knowledge_tool.discard_prefetch(question)
+    
+    async def _astream_final_answer(
+        self,
+        inputs: Dict[str, Any],
+        on_token: Callable[[str], None]
+    ) -> Dict[str, Any]:
+        """Run the executor, forwarding text after 'Final Answer:' as it streams"""
+        result = None
+        buffer = ""
+        start = sent = None
+        
+        async for event in self.agent_executor.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            
+            if kind == "on_chat_model_start":
+                # Each ReAct step is a fresh LLM call
+                buffer = ""
+                start = sent = None
+            
+            elif kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if not isinstance(content, str):
+                    continue
+                buffer += content
                 
-                return f"""IMAGE_STATUS: Image available
-    IMAGE_FILE: {filename}
-    IMAGE_SIZE: {metadata.size if metadata else 'Unknown'}
-    NOTE: User has uploaded a medical image. You can analyze it using analyze_medical_image tool."""
-            else:
-                return "IMAGE_STATUS: Image available (filename unknown)"
-        else:
-            return "IMAGE_STATUS: No image uploaded"
+                if start is None:
+                    idx = buffer.find(FINAL_ANSWER_ACTION)
+                    if idx == -1:
+                        continue
+                    start = sent = idx + len(FINAL_ANSWER_ACTION)
+                
+                text = buffer[sent:]
+                if sent == start:
+                    text = text.lstrip()
+                if text:
+                    on_token(text)
+                    sent = len(buffer)
+            
+            elif kind == "on_chain_end" and not event["parent_ids"]:
+                result = event["data"]["output"]
+        
+        return result
+    
+    async def run_batch_async(
+        self,
+        questions: List[str],
+        concurrency: int = 8,
+        skip_guard: bool = False
+    ) -> List[QueryResult]:
+        """
+        Process many independent questions concurrently (e.g. dataset evaluation)
+        
+        Each question runs with its own empty ConversationMemory so turns from
+        different questions never mix, and the agent's own history is untouched.
+        
+        Args:
+            questions: Questions to process
+            concurrency: Maximum agent executions in flight
+            skip_guard: Skip guard validation
+            
+        Returns:
+            Query results in the same order as questions
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def gated(question: str) -> QueryResult:
+            async with semaphore:
+                return await self.aquery(question, skip_guard, memory=ConversationMemory())
+        
+        logger.info(f"Running batch of {len(questions)} queries (concurrency={concurrency})")
+        return await asyncio.gather(*[gated(q) for q in questions])
+    
+    def _get_image_context(self) -> str:
+        """Image status for the prompt (formatted and cached by the handler)"""
+        return self.image_handler.get_image_context()
         
     def get_conversation_history(self) -> List[Dict[str, Any]]:
         """Get conversation history"""
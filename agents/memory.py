@@ -1,30 +1,81 @@
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, List, Dict, Any, Optional
 from datetime import datetime
+import orjson
 from loguru import logger
 
 from core.models import Message, MessageRole
 from config.settings import settings
 
 
+CONTEXT_SNIPPET_CHARS = 150
+
+COMPRESS_PROMPT = """Condense this medical conversation into short, self-contained facts.
+
+Rules:
+- One fact per line, starting with "- "
+- Resolve pronouns and references ("it", "that image") to what they mean
+- Keep conditions, symptoms, medications, doses, measurements and image findings
+- Drop greetings, filler and repeated information
+- Merge with the existing facts, updating any that changed
+
+EXISTING FACTS:
+{previous}
+
+CONVERSATION:
+{dialogue}
+
+FACTS:"""
+
+
+def truncate_at_word(text: str, limit: int) -> str:
+    """Truncate text at the last word boundary before limit (no ellipsis if it fits)"""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    if not text[limit].isspace() and " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "..."
+
+
 class ConversationMemory:
     """Manages conversation history with configurable retention"""
     
-    def __init__(self, max_history: int = None):
+    def __init__(self, max_history: int = None, llm_service=None):
         """
         Initialize conversation memory
         
         Args:
             max_history: Maximum conversation turns to keep
+            llm_service: LLM service used to compress turns that age out
+                (without it, old turns are simply dropped)
         """
         self.max_history = max_history or settings.max_memory_turns
-        self.conversation_history: List[Message] = []
+        self.conversation_history: Deque[Message] = deque(maxlen=self.max_history * 2)
+        self._context_cache: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        
+        # Semantic compression of aged turns
+        self.llm_service = llm_service
+        self.summary: Optional[Message] = None
+        self.archive: Deque[Message] = deque(maxlen=settings.memory_archive_messages)
+        self._generation = 0
+        self._compressor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-compress")
+            if llm_service is not None else None
+        )
+        
         logger.info(f"Memory initialized (max: {self.max_history} turns)")
     
     def add_exchange(
         self,
         user_query: str,
         assistant_response: str,
-        tools_used: List[str] = None
+        tools_used: List[str] = None,
+        generation: Optional[int] = None
     ):
         """
         Add conversation exchange
@@ -33,13 +84,14 @@ class ConversationMemory:
             user_query: User's question
             assistant_response: Assistant's response
             tools_used: List of tools used
+            generation: Value of `generation` when the turn started; the
+                exchange is dropped if the history was cleared since
         """
         # Add user message
         user_msg = Message(
             role=MessageRole.USER,
             content=user_query
         )
-        self.conversation_history.append(user_msg)
         
         # Add assistant message
         assistant_msg = Message(
@@ -47,31 +99,105 @@ class ConversationMemory:
             content=assistant_response,
             tools_used=tools_used or []
         )
-        self.conversation_history.append(assistant_msg)
         
-        # Trim if exceeds max
-        if len(self.conversation_history) > self.max_history * 2:
-            self.conversation_history = self.conversation_history[-(self.max_history * 2):]
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                logger.debug("Dropping exchange from before the history was cleared")
+                return
+            
+            # Compress the oldest turns instead of letting the deque drop them
+            if (self._compressor is not None
+                    and len(self.conversation_history) + 2 > self.conversation_history.maxlen):
+                self._compress_oldest()
+            
+            self.conversation_history.append(user_msg)
+            self.conversation_history.append(assistant_msg)
+            self._context_cache.clear()
         
         logger.debug(f"Added exchange. Total messages: {len(self.conversation_history)}")
     
+    def _compress_oldest(self):
+        """
+        Move the oldest turns to the archive and fold them into the summary in the background
+        
+        Caller holds _lock. The previous turn stays raw unless the history
+        only has room for one turn.
+        """
+        history = self.conversation_history
+        count = max(
+            min(settings.memory_compress_turns * 2, len(history) - 2),
+            len(history) + 2 - history.maxlen
+        )
+        evicted = [history.popleft() for _ in range(count)]
+        self.archive.extend(evicted)
+        self._compressor.submit(self._compress, evicted, self._generation)
+    
+    def _compress(self, evicted: List[Message], generation: int):
+        """Merge evicted messages into the running fact summary (runs on the compressor thread)"""
+        previous = self.summary.content if self.summary else "None"
+        dialogue = "\n".join(f"{msg.role.value.capitalize()}: {msg.content}" for msg in evicted)
+        
+        try:
+            facts = self.llm_service.generate_text(
+                COMPRESS_PROMPT.format(previous=previous, dialogue=dialogue)
+            ).strip()
+        except Exception as e:
+            logger.warning(f"Memory compression failed: {e}")
+            return
+        
+        with self._lock:
+            # History was cleared while we were compressing
+            if generation != self._generation:
+                return
+            compressed = len(evicted) + (self.summary.metadata.get("compressed_messages", 0) if self.summary else 0)
+            self.summary = Message(
+                role=MessageRole.SYSTEM,
+                content=facts,
+                metadata={"compressed_messages": compressed}
+            )
+            self._context_cache.clear()
+        
+        logger.debug(f"Compressed {len(evicted)} messages into summary")
+    
+    @property
+    def generation(self) -> int:
+        """Incremented by clear_history; lets in-flight turns detect a reset"""
+        return self._generation
+    
     def get_recent_context(self, n: int = 3) -> str:
         """
         Get N most recent conversation turns
         
+        Oldest turn first, newest last, with deterministic truncation, so the
+        rendered block only changes at its end between turns (keeps the
+        provider's prompt-prefix cache warm). Cached until history changes.
+        
+        Earlier turns that were compressed are prepended as a fact summary.
+        
         Args:
             n: Number of recent turns
             
         Returns:
             Formatted conversation context
         """
-        if not self.conversation_history:
+        with self._lock:
+            return self._build_context(n)
+    
+    def _build_context(self, n: int) -> str:
+        if not self.conversation_history and self.summary is None:
             return "No recent conversation."
         
+        if n in self._context_cache:
+            return self._context_cache[n]
+        
         # Get last N*2 messages (N user + N assistant)
-        recent_messages = self.conversation_history[-(n * 2):]
+        start = max(len(self.conversation_history) - n * 2, 0)
+        recent_messages = list(islice(self.conversation_history, start, None))
         
-        context_parts = ["RECENT CONVERSATION CONTEXT:\n"]
+        context_parts = []
+        if self.summary is not None:
+            context_parts.append(f"EARLIER CONVERSATION (summarized):\n{self.summary.content}\n")
+        context_parts.append("RECENT CONVERSATION CONTEXT:\n")
         
         i = 0
         while i < len(recent_messages):
@@ -81,21 +207,28 @@ class ConversationMemory:
                 
                 context_parts.append(
                     f"User: {user_msg.content}\n"
-                    f"Assistant: {assistant_msg.content[:150]}...\n"
+                    f"Assistant: {truncate_at_word(assistant_msg.content, CONTEXT_SNIPPET_CHARS)}\n"
                 )
                 i += 2
             else:
                 i += 1
         
-        return "\n".join(context_parts)
+        context = "\n".join(context_parts)
+        self._context_cache[n] = context
+        return context
     
     def get_all_messages(self) -> List[Message]:
         """Get all conversation messages"""
-        return self.conversation_history
+        return list(self.conversation_history)
     
     def clear_history(self):
         """Clear all conversation history"""
-        self.conversation_history.clear()
+        with self._lock:
+            self.conversation_history.clear()
+            self._context_cache.clear()
+            self.summary = None
+            self.archive.clear()
+            self._generation += 1
         logger.info("Conversation history cleared")
     
     def get_summary(self) -> str:
@@ -124,4 +257,17 @@ class ConversationMemory:
                 "metadata": msg.metadata
             }
             for msg in self.conversation_history
-        ]
\ No newline at end of file
+        ]
+    
+    def export_history_json(self) -> str:
+        """Export conversation history as a JSON string (orjson, datetimes serialized natively)"""
+        return orjson.dumps([
+            {
+                "role": msg.role.value,
+                "content": msg.content,
+                "timestamp": msg.timestamp,
+                "tools_used": msg.tools_used,
+                "metadata": msg.metadata
+            }
+            for msg in self.conversation_history
+        ], option=orjson.OPT_SERIALIZE_NUMPY).decode()
\ No newline at end of file
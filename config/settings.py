@@ -14,18 +14,35 @@ class Settings(BaseSettings):
     # Pinecone Configuration
     pinecone_index_name: str = Field(default="medical-pdf-index")
     pinecone_environment: str = Field(default="us-east-1")
+    pinecone_pool_threads: int = Field(default=10)
     
     # Model Configuration
     gemini_model: str = Field(default="gemini-2.5-flash-lite")
     embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2")
+    embedding_cache_size: int = Field(default=256)
     
     # Agent Configuration
     max_iterations: int = Field(default=15)
     max_memory_turns: int = Field(default=10)
+    memory_compress_turns: int = Field(default=3)
+    memory_archive_messages: int = Field(default=200)
     top_k_results: int = Field(default=10)
+    knowledge_cache_size: int = Field(default=1024)
     llm_temperature: float = Field(default=0.0)
     max_output_tokens: int = Field(default=4096)
     
+    # LLM Response Cache
+    llm_cache_ttl: int = Field(default=600)
+    llm_text_cache_size: int = Field(default=512)
+    llm_vision_cache_size: int = Field(default=128)
+    llm_file_cache_size: int = Field(default=64)
+    llm_file_cache_ttl: int = Field(default=3600)
+    gemini_max_concurrency: int = Field(default=10)
+    
+    # Guard Configuration
+    guard_cache_size: int = Field(default=512)
+    guard_cache_threshold: float = Field(default=0.92)
+    
     # Medical Keywords for Guard
     medical_keywords: List[str] = Field(default=[
         'symptom', 'disease', 'treatment', 'diagnosis', 'medical', 'health',
@@ -12,7 +12,7 @@ class Message(BaseModel):
     role: MessageRole
     content: str
     timestamp: datetime = Field(default_factory=datetime.now)
-    tool_used: List[str] = Field(default_factory=list)
+    tools_used: List[str] = Field(default_factory=list)
     metadata: Dict[str, Any] = Field(default_factory=dict)
     
 class QueryResult(BaseModel):
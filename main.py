@@ -2,6 +2,7 @@ import sys
 from loguru import logger
 from dotenv import load_dotenv
 from config.settings import settings
+from services.embedding_service import EmbeddingService
 from services.knowledge_base import KnowledgeBaseService
 from services.image_handler import ImageHandlerService
 from services.llm_service import LLMService
@@ -28,7 +29,8 @@ def initialize_application():
         
         # Initialize services
         logger.info("Initializing services...")
-        knowledge_service = KnowledgeBaseService()
+        embedding_service = EmbeddingService()
+        knowledge_service = KnowledgeBaseService(embedding_service)
         image_handler = ImageHandlerService()
         llm_service = LLMService()
         
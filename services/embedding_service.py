@@ -0,0 +1,61 @@
+"""
+Embedding Service - Single Responsibility: Text embeddings
+"""
+
+from functools import lru_cache
+from typing import List, Tuple
+import numpy as np
+from loguru import logger
+from fastembed import TextEmbedding
+
+from config.settings import settings
+from core.exceptions import ToolExecutionError, InitializationError
+
+
+class EmbeddingService:
+    """Owns the single embedding model shared by all consumers"""
+
+    def __init__(self):
+        """Load the embedding model (ONNX Runtime, no PyTorch)"""
+        try:
+            logger.info("Initializing Embedding Service...")
+
+            self.embed_model = TextEmbedding(
+                model_name=settings.embedding_model,
+                providers=["CPUExecutionProvider"]
+            )
+
+            # Per-instance LRU of unit vectors (tuples, so cached values are immutable)
+            self._embed_cached = lru_cache(maxsize=settings.embedding_cache_size)(
+                self._embed_normalized
+            )
+
+            logger.success("Embedding Service initialized")
+
+        except Exception as e:
+            logger.error(f"Failed to initialize Embedding Service: {e}")
+            raise InitializationError(f"Embedding model init failed: {e}")
+
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _embed_normalized(self, text: str) -> Tuple[float, ...]:
+        return tuple(self._normalize(next(iter(self.embed_model.embed([text])))).tolist())
+
+    def embed(self, text: str) -> List[float]:
+        """Get unit-length embedding for a single text (repeat texts hit an LRU cache)"""
+        try:
+            return list(self._embed_cached(text))
+        except Exception as e:
+            logger.error(f"Embedding generation failed: {e}")
+            raise ToolExecutionError(f"Embedding failed: {e}")
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get unit-length embeddings for several texts in one model call"""
+        try:
+            return [self._normalize(vec).tolist() for vec in self.embed_model.embed(texts)]
+        except Exception as e:
+            logger.error(f"Batch embedding generation failed: {e}")
+            raise ToolExecutionError(f"Embedding failed: {e}")
@@ -1,32 +1,83 @@
-from typing import Tuple
+import re
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+import ahocorasick
+import numpy as np
 from loguru import logger
 
 from config.settings import settings
 from core.exceptions import GuardRejectionError
 
 
+MEDICAL_VERBS = ['analyze', 'diagnosis', 'examine', 'assess', 'evaluate',
+                 'check', 'look at', 'review', 'interpret']
+
+
 class GuardService:
     """Validates medical relevance of queries"""
     
-    def __init__(self, llm_service):
+    # "YES - reason", "**No**: reason", "Not medical", "NOPE", etc. (leading
+    # markdown emphasis/punctuation skipped; any YES/NO prefix counts, as before)
+    _RESP_RE = re.compile(
+        r"^[\s*_`#>\"'\-–:.]*(YES|NO)(\w*)[\s*_`\-:–.,]*(.*)$",
+        re.IGNORECASE | re.DOTALL
+    )
+    # Fallback: a standalone YES/NO token anywhere in the reply
+    _TOKEN_RE = re.compile(r"\b(YES|NO)\b", re.IGNORECASE)
+    
+    def __init__(self, llm_service, embedding_service=None):
+        """
+        Initialize guard service
+
+        Args:
+            llm_service: LLM service for fallback validation
+            embedding_service: Shared embedding service backing the
+                semantic verdict cache (cache disabled if None)
+        """
         self.llm_service = llm_service
+        self.embedding_service = embedding_service
         self.medical_keywords = settings.medical_keywords
+        
+        # Single-pass matcher for keywords (Layer 1) and verbs (Layer 2).
+        # Keywords are added last so overlapping entries keep the "kw" tag.
+        self._automaton = ahocorasick.Automaton()
+        for verb in MEDICAL_VERBS:
+            self._automaton.add_word(verb.lower(), ("verb", verb))
+        for kw in self.medical_keywords:
+            self._automaton.add_word(kw.lower(), ("kw", kw))
+        self._automaton.make_automaton()
+
+        # Semantic cache of LLM verdicts (unit vectors + parallel verdict list)
+        self._guard_cache_size = settings.guard_cache_size
+        self._guard_cache_vecs: Optional[np.ndarray] = None
+        self._guard_cache_verdicts: List[Tuple[bool, str]] = []
+        self._guard_cache_lru: Deque[int] = deque()
+        self._guard_cache_lock = threading.Lock()
+
         logger.info("Guard Service initialized")
     
     def is_medical_query(self, query: str) -> Tuple[bool, str]:
         query_lower = query.lower()
         
-        # Layer 1: Keyword matching
-        if any(kw in query_lower for kw in self.medical_keywords):
-            return True, "Medical keywords detected"
-        
-        # Layer 2: Medical context
-        medical_verbs = ['analyze', 'diagnosis', 'examine', 'assess', 'evaluate', 
-                        'check', 'look at', 'review', 'interpret']
-        if any(verb in query_lower for verb in medical_verbs):
+        # Layer 1 + 2: Keyword / medical context matching in one scan
+        has_verb = False
+        for _, (tag, _) in self._automaton.iter(query_lower):
+            if tag == "kw":
+                return True, "Medical keywords detected"
+            has_verb = True
+        if has_verb:
             return True, "Medical context detected"
         
-        # Layer 3: LLM validation
+        # Layer 3: LLM validation (semantic cache first). Embed the raw query:
+        # the knowledge-base prefetch embeds the same text, so it hits the LRU
+        query_vec = self._embed(query)
+        if query_vec is not None:
+            cached = self._cache_lookup(query_vec)
+            if cached is not None:
+                logger.debug("Guard cache hit")
+                return cached
+
         try:
             validation_prompt = f"""Is this query medical/healthcare related?
 
@@ -41,17 +92,85 @@ Examples:
 
 Response:"""
 
-            response = self.llm_service.generate_text(validation_prompt).strip()
+            response = self.llm_service.generate_text(validation_prompt)
             
-            if response.upper().startswith("YES"):
-                return True, "LLM validated as medical"
-            else:
-                reason = response.split("-", 1)[1].strip() if "-" in response else "Not medical"
-                return False, reason
+            verdict = self._parse_verdict(response)
+            if verdict is None:
+                return True, "Validation unparseable - allowing"
+
+            if query_vec is not None:
+                self._cache_store(query_vec, verdict)
+            return verdict
                 
         except Exception as e:
             logger.warning(f"LLM validation failed: {e}")
             return True, "Validation inconclusive - allowing"
+
+    @classmethod
+    def _parse_verdict(cls, response: str) -> Optional[Tuple[bool, str]]:
+        """Turn the validator's reply into a verdict, or None if it has no YES/NO"""
+        match = cls._RESP_RE.match(response)
+        if match is not None:
+            if match.group(1).upper() == "YES":
+                return True, "LLM validated as medical"
+            # "NO - reason" keeps its reason; "Not medical"/"NOPE" are the reason
+            reason = response.strip(" \t\n*_`") if match.group(2) else match.group(3).strip()
+            return False, reason or "Not medical"
+
+        token = cls._TOKEN_RE.search(response)
+        if token is None:
+            return None
+        if token.group(1).upper() == "YES":
+            return True, "LLM validated as medical"
+        return False, "Not medical"
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text as a unit vector, or None if the cache is unavailable"""
+        if self.embedding_service is None or self._guard_cache_size <= 0:
+            return None
+        try:
+            vec = np.asarray(self.embedding_service.embed(text), dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm else None
+        except Exception as e:
+            logger.warning(f"Guard cache embedding failed: {e}")
+            return None
+
+    def _cache_lookup(self, vec: np.ndarray) -> Optional[Tuple[bool, str]]:
+        """Return the cached verdict of the most similar prior query, if close enough"""
+        with self._guard_cache_lock:
+            count = len(self._guard_cache_verdicts)
+            if count == 0:
+                return None
+
+            # Cosine similarity against every cached entry in one matmul
+            sims = self._guard_cache_vecs[:count] @ vec
+            idx = int(np.argmax(sims))
+            if sims[idx] < settings.guard_cache_threshold:
+                return None
+
+            # Mark as most recently used
+            self._guard_cache_lru.remove(idx)
+            self._guard_cache_lru.append(idx)
+            return self._guard_cache_verdicts[idx]
+
+    def _cache_store(self, vec: np.ndarray, verdict: Tuple[bool, str]):
+        """Insert verdict, evicting the least recently used entry when full"""
+        with self._guard_cache_lock:
+            if self._guard_cache_vecs is None:
+                self._guard_cache_vecs = np.zeros(
+                    (self._guard_cache_size, vec.shape[0]), dtype=np.float32
+                )
+
+            if len(self._guard_cache_verdicts) < self._guard_cache_size:
+                idx = len(self._guard_cache_verdicts)
+                self._guard_cache_verdicts.append(verdict)
+            else:
+                idx = self._guard_cache_lru.popleft()
+                self._guard_cache_verdicts[idx] = verdict
+
+            self._guard_cache_vecs[idx] = vec
+            self._guard_cache_lru.append(idx)
     
     def get_rejection_message(self, reason: str) -> str:
         """Generate user-friendly rejection message"""
@@ -1,13 +1,36 @@
-from typing import Optional, Tuple, Dict
+from typing import Iterable, Optional, Tuple, Dict
 from datetime import datetime
-from PIL import Image
-import io
+from PIL import Image, ImageFile
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from loguru import logger
 from core.models import ImageMetadata
 from core.exceptions import ImageProcessingError
 
 
+HTTP_HEADERS = {"User-Agent": "MedicalAI/2.0"}
+HTTP_TIMEOUT = 15
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _decode_chunks(chunks: Iterable[bytes]) -> Image.Image:
+    """Decode an image incrementally as its bytes arrive"""
+    parser = ImageFile.Parser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def _ensure_rgb(image: Image.Image) -> Image.Image:
+    """Convert to RGB only when needed (convert() always copies the pixels)"""
+    if image.mode == "RGB":
+        image.load()  # decode now, as convert() would, so the source can close
+        return image
+    return image.convert("RGB")
+
+
 class ImageHandlerService:
     """Manages image uploads and storage"""
     
@@ -16,34 +39,60 @@ class ImageHandlerService:
         self.uploaded_images: Dict[str, Dict] = {}
         self.pending_image: Optional[Image.Image] = None
         self.pending_filename: Optional[str] = None
+        self._image_context: Optional[str] = None
+        # Pooled keep-alive session for sync URL loads
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.3)
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(HTTP_HEADERS)
         logger.info("Image Handler Service initialized")
     
     def load_image(self, image_source: any) -> Image.Image:
         try:
             if isinstance(image_source, Image.Image):
-                return image_source.convert("RGB")    
+                return _ensure_rgb(image_source)    
             elif isinstance(image_source, str):
                 if image_source.startswith(('http://', 'https://')):
-                    # Load from URL
-                    response = requests.get(
+                    # Load from URL, decoding while streaming
+                    with self._session.get(
                         image_source,
-                        headers={"User-Agent": "MedicalAI/2.0"},
-                        timeout=15
-                    )
-                    response.raise_for_status()
-                    return Image.open(io.BytesIO(response.content)).convert("RGB")
+                        timeout=HTTP_TIMEOUT,
+                        stream=True
+                    ) as response:
+                        response.raise_for_status()
+                        image = _decode_chunks(response.iter_content(DOWNLOAD_CHUNK_SIZE))
+                    return _ensure_rgb(image)
                 else:
                     # Load from file path
-                    return Image.open(image_source).convert("RGB")
+                    return _ensure_rgb(Image.open(image_source))
             elif hasattr(image_source, 'read'):
                 # File-like object
-                return Image.open(image_source).convert("RGB")
+                return _ensure_rgb(Image.open(image_source))
             raise ValueError(f"Unsupported image source type: {type(image_source)}") 
         except Exception as e:
             logger.error(f"Failed to load image: {e}")
             raise ImageProcessingError(f"Image load failed: {e}")
     
-    def store_image(self, image: Image.Image, filename: str) -> ImageMetadata:
+    def store_image(
+        self,
+        image: Image.Image,
+        filename: str,
+        source_bytes: Optional[bytes] = None
+    ) -> ImageMetadata:
+        """
+        Store an uploaded image and mark it pending
+        
+        Args:
+            image: Decoded (or lazily opened) image
+            filename: Upload filename
+            source_bytes: Encoded file contents; hashed once here so the LLM
+                caches can key on the image without re-reading its pixels
+        """
         try:
             metadata = ImageMetadata(
                 filename=filename,
@@ -53,11 +102,13 @@ class ImageHandlerService:
             
             self.uploaded_images[filename] = {
                 "image": image,
-                "metadata": metadata
-            } 
+                "metadata": metadata,
+                "digest": hashlib.sha256(source_bytes).digest() if source_bytes is not None else None
+            }
             # Set as pending
             self.pending_image = image
             self.pending_filename = filename
+            self._image_context = None
             
             logger.info(f"Image stored: {filename}")
             logger.info(f"Pending: {self.has_pending_image()}")
@@ -76,6 +127,7 @@ class ImageHandlerService:
             filename = self.pending_filename
             self.pending_image = None
             self.pending_filename = None
+            self._image_context = None
             return (img, filename)
         return None
     
@@ -83,13 +135,31 @@ class ImageHandlerService:
         """Check if there's a pending image"""
         return self.pending_image is not None
     
+    def get_image_context(self) -> str:
+        """Prompt-ready status of the pending image (cached until uploads change)"""
+        if self._image_context is None:
+            filename = self.pending_filename
+            if filename is None:
+                self._image_context = "IMAGE_STATUS: No image uploaded"
+            else:
+                metadata = self.uploaded_images.get(filename, {}).get("metadata")
+                self._image_context = f"""IMAGE_STATUS: Image available
+    IMAGE_FILE: {filename}
+    IMAGE_SIZE: {metadata.size if metadata else 'Unknown'}
+    NOTE: User has uploaded a medical image. You can analyze it using analyze_medical_image tool."""
+        return self._image_context
+    
+    def get_image_digest(self, filename: str) -> Optional[bytes]:
+        """Content digest recorded when the image was stored, if any"""
+        return self.uploaded_images.get(filename, {}).get("digest")
+    
     def get_uploaded_image(self, filename: Optional[str] = None) -> Optional[Image.Image]:
         """Get uploaded image by filename or most recent"""
         if not self.uploaded_images:
             return None
         
         if filename is None:
-            filename = list(self.uploaded_images.keys())[-1]       
+            filename = next(reversed(self.uploaded_images))
         return self.uploaded_images.get(filename, {}).get("image")
     
     def clear_all(self):
@@ -97,4 +167,5 @@ class ImageHandlerService:
         self.uploaded_images.clear()
         self.pending_image = None
         self.pending_filename = None
+        self._image_context = None
         logger.info("All images cleared")
\ No newline at end of file
@@ -2,43 +2,40 @@
 Knowledge Base Service - Single Responsibility: Vector DB operations
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from loguru import logger
-# UPDATED IMPORT - Works with pinecone-client 2.x
-try:
-    from pinecone import Pinecone  # v3+
-except ImportError:
-    import pinecone  # v2.x
-    Pinecone = None
-
-from sentence_transformers import SentenceTransformer
+from pinecone import Pinecone
 
 from config.settings import settings
 from core.exceptions import ToolExecutionError, InitializationError
+from services.embedding_service import EmbeddingService
 
 
 class KnowledgeBaseService:
     """Handles all knowledge base operations"""
     
-    def __init__(self):
-        """Initialize knowledge base connection"""
+    def __init__(self, embedding_service: EmbeddingService):
+        """
+        Initialize knowledge base connection
+        
+        Args:
+            embedding_service: Shared embedding model
+        """
         try:
             logger.info("Initializing Knowledge Base Service...")
             
-            # Initialize Pinecone (compatible with v2.x and v3.x)
-            if Pinecone:  # v3+
-                self.pc = Pinecone(api_key=settings.pinecone_api_key)
-                self.index = self.pc.Index(settings.pinecone_index_name)
-            else:  # v2.x
-                import pinecone
-                pinecone.init(
-                    api_key=settings.pinecone_api_key,
-                    environment=settings.pinecone_environment
-                )
-                self.index = pinecone.Index(settings.pinecone_index_name)
-            
-            # Initialize embedding model
-            self.embed_model = SentenceTransformer(settings.embedding_model)
+            # Initialize Pinecone (v3+ client)
+            self.pc = Pinecone(
+                api_key=settings.pinecone_api_key,
+                pool_threads=settings.pinecone_pool_threads
+            )
+            self.index = self.pc.Index(
+                settings.pinecone_index_name,
+                pool_threads=settings.pinecone_pool_threads
+            )
+            
+            self.embedding_service = embedding_service
             
             logger.success("Knowledge Base Service initialized")
             
@@ -61,7 +58,7 @@ class KnowledgeBaseService:
             top_k = top_k or settings.top_k_results
             
             # Generate embedding
-            query_embedding = self.embed_model.encode([query]).tolist()[0]
+            query_embedding = self.embedding_service.embed(query)
             
             # Search Pinecone
             results = self.index.query(
@@ -70,18 +67,7 @@ class KnowledgeBaseService:
                 include_metadata=True
             )
             
-            if not results.get("matches"):
-                return []
-            
-            # Format results
-            formatted_results = []
-            for match in results["matches"]:
-                formatted_results.append({
-                    "score": match.get("score", 0.0),
-                    "text": match["metadata"].get("text", ""),
-                    "source": match["metadata"].get("source", "unknown"),
-                    "metadata": match.get("metadata", {})
-                })
+            formatted_results = self._format_matches(results)
             
             logger.info(f"Found {len(formatted_results)} results for query")
             return formatted_results
@@ -90,10 +76,61 @@ class KnowledgeBaseService:
             logger.error(f"Knowledge base search failed: {e}")
             raise ToolExecutionError(f"Search failed: {e}")
     
-    def get_embedding(self, text: str) -> List[float]:
-        """Get embedding for text"""
+    def search_batch(self, queries: List[str], top_k: int = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search knowledge base for several queries at once
+        
+        Embeds all queries in one model call, then issues the Pinecone
+        queries concurrently on a thread pool.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results per query (defaults to settings)
+            
+        Returns:
+            One result list per query, in input order
+        """
+        if not queries:
+            return []
+        
         try:
-            return self.embed_model.encode([text]).tolist()[0]
+            top_k = top_k or settings.top_k_results
+            
+            embeddings = self.embedding_service.embed_batch(queries)
+            
+            def query(embedding):
+                return self._format_matches(self.index.query(
+                    vector=embedding,
+                    top_k=top_k,
+                    include_metadata=True
+                ))
+            
+            with ThreadPoolExecutor(max_workers=len(embeddings)) as pool:
+                batch_results = list(pool.map(query, embeddings))
+            
+            logger.info(f"Batch searched {len(queries)} queries")
+            return batch_results
+            
         except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            raise ToolExecutionError(f"Embedding failed: {e}")
\ No newline at end of file
+            logger.error(f"Knowledge base batch search failed: {e}")
+            raise ToolExecutionError(f"Batch search failed: {e}")
+    
+    @staticmethod
+    def _format_matches(results) -> List[Dict[str, Any]]:
+        """Flatten a Pinecone query response into result dicts"""
+        if not results.get("matches"):
+            return []
+        
+        formatted_results = []
+        for match in results["matches"]:
+            formatted_results.append({
+                "score": match.get("score", 0.0),
+                "text": match["metadata"].get("text", ""),
+                "source": match["metadata"].get("source", "unknown"),
+                "metadata": match.get("metadata", {})
+            })
+        return formatted_results
+    
+    def get_embedding(self, text: str) -> List[float]:
+        """Get embedding for text"""
+        return self.embedding_service.embed(text)
\ No newline at end of file
@@ -1,11 +1,72 @@
-from typing import Any, List
+import asyncio
+from concurrent.futures import Future
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+import hashlib
+import io
+import threading
+from cachetools import TTLCache
 import google.generativeai as genai
+from google.api_core.exceptions import ServiceUnavailable
 from loguru import logger
-from langchain_google_genai import ChatGoogleGenerativeAI
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 from config.settings import settings
 from core.exceptions import InitializationError
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+# Retry transient Gemini outages (503) with jittered exponential backoff
+_retry_unavailable = retry(
+    wait=wait_random_exponential(min=0.2, max=4),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type(ServiceUnavailable),
+    reraise=True
+)
+
+
+class _FileHandleCache(TTLCache):
+    """
+    TTLCache of Gemini Files API handles whose remote files are deleted on eviction
+    
+    Evicted handles are only collected here; the owner calls delete_evicted()
+    after releasing its lock so the network deletes don't block other callers.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._evicted: List[Any] = []
+    
+    def popitem(self):
+        key, handle = super().popitem()
+        self._evicted.append(handle)
+        return key, handle
+    
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self._evicted.extend(handle for _, handle in expired)
+        return expired
+    
+    def take_evicted(self) -> List[Any]:
+        """Hand over the handles evicted so far (call under the owner's lock)"""
+        evicted, self._evicted = self._evicted, []
+        return evicted
+    
+    @staticmethod
+    def delete_evicted(handles: List[Any]):
+        for handle in handles:
+            _FileHandleCache._delete(handle)
+    
+    @staticmethod
+    def _delete(handle):
+        try:
+            genai.delete_file(handle)
+        except Exception as e:
+            logger.debug(f"Could not delete uploaded file {handle.name}: {e}")
+
 
 class LLMService:
     """Handles all LLM operations"""
@@ -17,34 +78,256 @@ class LLMService:
             
             genai.configure(api_key=settings.google_api_key)
             self.gemini_vision = genai.GenerativeModel(settings.gemini_model)
-            self.langchain_llm = ChatGoogleGenerativeAI(
-                model=settings.gemini_model,
-                temperature=settings.llm_temperature,
-                max_output_tokens=settings.max_output_tokens,
-                google_api_key=settings.google_api_key  
+            
+            # Response caches keyed by a hash of (prompt, image bytes)
+            self._text_cache = TTLCache(
+                maxsize=settings.llm_text_cache_size,
+                ttl=settings.llm_cache_ttl
+            )
+            self._vision_cache = TTLCache(
+                maxsize=settings.llm_vision_cache_size,
+                ttl=settings.llm_cache_ttl
+            )
+            self._cache_lock = threading.Lock()
+            
+            # Files API handles keyed by image digest, so an image is uploaded once
+            self._file_handles = _FileHandleCache(
+                maxsize=settings.llm_file_cache_size,
+                ttl=settings.llm_file_cache_ttl
             )
             
+            # Single-flight: concurrent identical calls share one Gemini request
+            self._inflight: Dict[bytes, Future] = {}
+            self._inflight_lock = threading.Lock()
+            
+            # Bulkhead: cap concurrent Gemini requests across all threads and event loops
+            self._gemini_slots = threading.BoundedSemaphore(settings.gemini_max_concurrency)
+            
             logger.success("LLMService initialized")
             
         except Exception as e:
             logger.error(f"Failed to initialize LLMService: {e}")
             raise InitializationError(f"Could not initialize LLMService: {e}")
     
+    @staticmethod
+    def _image_digest(image: Any) -> bytes:
+        """Identify an image by content (PIL image) or by name (uploaded File)"""
+        if isinstance(image, genai.types.File):
+            return image.name.encode()
+        h = hashlib.sha256(f"{image.mode}{image.size}".encode())
+        h.update(image.tobytes())
+        return h.digest()
+    
+    @staticmethod
+    def _cache_key(prompt: str, image_digest: bytes = b"") -> bytes:
+        """Hash prompt (and image digest) into a compact cache key"""
+        h = hashlib.blake2b(prompt.encode(), digest_size=16)
+        h.update(image_digest)
+        return h.digest()
+    
+    def _cache_get(self, cache: TTLCache, key: bytes):
+        with self._cache_lock:
+            return cache.get(key)
+    
+    def _cache_set(self, cache: TTLCache, key: bytes, value: Any):
+        with self._cache_lock:
+            cache[key] = value
+            evicted = cache.take_evicted() if cache is self._file_handles else None
+        
+        # Remote file deletes happen outside the lock shared by all caches
+        if evicted:
+            _FileHandleCache.delete_evicted(evicted)
+    
+    def _single_flight(self, key: bytes, call: Callable[[], Any]) -> Any:
+        """Run call once per key; callers arriving while it runs wait for its result"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        
+        if not leader:
+            logger.debug("Joining in-flight LLM call")
+            return future.result()
+        
+        try:
+            result = call()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    @_retry_unavailable
+    def _generate_content(self, contents: Any) -> Any:
+        """One Gemini request, holding a bulkhead slot (released between retries)"""
+        with self._gemini_slots:
+            return self.gemini_vision.generate_content(contents)
+    
     def generate_text(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        cached = self._cache_get(self._text_cache, key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        
+        return self._single_flight(key, lambda: self._generate_text(prompt, key))
+    
+    def _generate_text(self, prompt: str, key: bytes) -> str:
         try:
-            response = self.gemini_vision.generate_content(prompt)
-            return response.text
+            response = self._generate_content(prompt)
+            text = response.text
         except Exception as e:
             logger.error(f"Text generation failed: {e}")
             raise
+        
+        self._cache_set(self._text_cache, key, text)
+        return text
+    
+    async def agenerate_text(self, prompt: str) -> str:
+        """generate_text for async callers; runs in a worker thread under the same bulkhead"""
+        return await asyncio.to_thread(self.generate_text, prompt)
+    
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Generate text, yielding chunks as Gemini produces them
+        
+        Args:
+            prompt: Prompt text
+            
+        Yields:
+            Response text chunks (a cached response is yielded whole)
+        """
+        key = self._cache_key(prompt)
+        cached = self._cache_get(self._text_cache, key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            yield cached
+            return
+        
+        parts = []
+        try:
+            with self._gemini_slots:
+                for chunk in self.gemini_vision.generate_content(prompt, stream=True):
+                    parts.append(chunk.text)
+                    yield chunk.text
+        except Exception as e:
+            logger.error(f"Text streaming failed: {e}")
+            raise
+        
+        # Only complete responses are cached
+        self._cache_set(self._text_cache, key, "".join(parts))
     
-    def analyze_image(self, prompt: str, image: Any) -> str:
+    def _upload_image(self, image: Any, digest: bytes) -> Any:
+        """Return a Files API handle for image, uploading it on first use (inline image on failure)"""
+        if isinstance(image, genai.types.File):
+            return image
+        
+        handle = self._cache_get(self._file_handles, digest)
+        if handle is not None:
+            return handle
+        
+        return self._single_flight(digest, lambda: self._upload_new_image(image, digest))
+    
+    def _upload_new_image(self, image: Any, digest: bytes) -> Any:
         try:
-            response = self.gemini_vision.generate_content([prompt, image])
-            return response.text
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            buffer.seek(0)
+            with self._gemini_slots:
+                handle = genai.upload_file(buffer, mime_type="image/png", display_name=digest.hex()[:16])
+        except Exception as e:
+            logger.warning(f"Image upload failed, sending inline: {e}")
+            return image
+        
+        self._cache_set(self._file_handles, digest, handle)
+        return handle
+    
+    def analyze_image(self, prompt: str, image: Any, digest: Optional[bytes] = None) -> str:
+        """
+        Analyze an image with Gemini vision
+        
+        Args:
+            prompt: Analysis instructions
+            image: PIL image, or a genai File handle from a previous upload
+            digest: Precomputed content digest (e.g. from ImageHandlerService);
+                computed from the pixels when omitted
+        """
+        if digest is None:
+            digest = self._image_digest(image)
+        key = self._cache_key(prompt, digest)
+        cached = self._cache_get(self._vision_cache, key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        
+        return self._single_flight(key, lambda: self._analyze_image(prompt, image, digest, key))
+    
+    def _analyze_image(self, prompt: str, image: Any, digest: bytes, key: bytes) -> str:
+        try:
+            image_part = self._upload_image(image, digest)
+            response = self._generate_content([prompt, image_part])
+            text = response.text
         except Exception as e:
             logger.error(f"Image analysis failed: {e}")
             raise
+        
+        self._cache_set(self._vision_cache, key, text)
+        return text
+    
+    async def aanalyze_image(self, prompt: str, image: Any, digest: Optional[bytes] = None) -> str:
+        """analyze_image for async callers; runs in a worker thread under the same bulkhead"""
+        return await asyncio.to_thread(self.analyze_image, prompt, image, digest)
+    
+    @cached_property
+    def langchain_llm(self) -> "ChatGoogleGenerativeAI":
+        """LangChain chat model, imported and built on first use (only the agent needs it)"""
+        try:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            
+            return ChatGoogleGenerativeAI(
+                model=settings.gemini_model,
+                temperature=settings.llm_temperature,
+                max_output_tokens=settings.max_output_tokens,
+                google_api_key=settings.google_api_key  
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize LangChain LLM: {e}")
+            raise InitializationError(f"Could not initialize LangChain LLM: {e}")
+    
+    @cached_property
+    def _limited_langchain_llm(self) -> "Runnable":
+        """langchain_llm holding a bulkhead slot per call, like the direct genai calls"""
+        from langchain_core.runnables import RunnableLambda
+        
+        llm = self.langchain_llm
+        slots = self._gemini_slots
+        
+        def invoke(messages, config, **kwargs):
+            with slots:
+                return llm.invoke(messages, config, **kwargs)
+        
+        async def ainvoke(messages, config, **kwargs):
+            # Threading semaphore (shared with sync callers); wait for it off the loop
+            acquiring = asyncio.ensure_future(asyncio.to_thread(slots.acquire))
+            try:
+                await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # The worker thread still takes the slot; hand it back once it does
+                acquiring.add_done_callback(
+                    lambda f: f.cancelled() or f.exception() or slots.release()
+                )
+                raise
+            try:
+                return await llm.ainvoke(messages, config, **kwargs)
+            finally:
+                slots.release()
+        
+        return RunnableLambda(invoke, afunc=ainvoke, name="ChatGoogleGenerativeAI")
     
-    def get_langchain_llm(self) -> ChatGoogleGenerativeAI:
-        return self.langchain_llm
\ No newline at end of file
+    def get_langchain_llm(self) -> "Runnable":
+        """Chat model for the agent, limited by the shared Gemini concurrency cap"""
+        return self._limited_langchain_llm
\ No newline at end of file
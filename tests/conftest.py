@@ -0,0 +1,11 @@
+"""
+Shared test setup
+
+Settings require the API keys at import time; the tests never reach the
+real services, so placeholders are enough.
+"""
+
+import os
+
+for _key in ("GOOGLE_API_KEY", "PINECONE_API_KEY", "SERPAPI_KEY"):
+    os.environ.setdefault(_key, "test")
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from services.guard_service import GuardService
+
+
+class FakeLLM:
+    """Returns a fixed reply and counts calls"""
+    
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = 0
+    
+    def generate_text(self, prompt: str) -> str:
+        self.calls += 1
+        return self.reply
+
+
+class FakeEmbeddings:
+    """Maps each query to a fixed vector"""
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+    
+    def embed(self, text: str):
+        return self.vectors[text]
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("YES - disease symptoms", (True, "LLM validated as medical")),
+    ("yes", (True, "LLM validated as medical")),
+    ("NO - not medical", (False, "not medical")),
+    ("**NO** - weather question", (False, "weather question")),
+    ("No: sports", (False, "sports")),
+    ("NO", (False, "Not medical")),
+    ("Not medical", (False, "Not medical")),
+    ("NOPE", (False, "NOPE")),
+    ("The answer is NO.", (False, "Not medical")),
+    ("Answer: YES", (True, "LLM validated as medical")),
+])
+def test_parse_verdict(reply, expected):
+    assert GuardService._parse_verdict(reply) == expected
+
+
+def test_parse_verdict_without_token():
+    assert GuardService._parse_verdict("I cannot tell") is None
+
+
+def test_keywords_skip_the_llm():
+    llm = FakeLLM("NO")
+    guard = GuardService(llm)
+    
+    assert guard.is_medical_query("What are flu symptoms?")[0] is True
+    assert llm.calls == 0
+
+
+def test_semantic_cache_reuses_verdict_for_similar_query():
+    llm = FakeLLM("NO - weather")
+    embeddings = FakeEmbeddings({
+        "what's the weather?": [1.0, 0.0, 0.0],
+        "how is the weather?": [0.99, 0.05, 0.0],
+        "who won the match?": [0.0, 1.0, 0.0],
+    })
+    guard = GuardService(llm, embeddings)
+    
+    assert guard.is_medical_query("what's the weather?") == (False, "weather")
+    assert guard.is_medical_query("how is the weather?") == (False, "weather")
+    assert llm.calls == 1
+    
+    guard.is_medical_query("who won the match?")
+    assert llm.calls == 2
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    llm = FakeLLM("NO - off topic")
+    embeddings = FakeEmbeddings({"a": [1.0, 0.0, 0.0], "b": [0.0, 1.0, 0.0], "c": [0.0, 0.0, 1.0]})
+    guard = GuardService(llm, embeddings)
+    guard._guard_cache_size = 2
+    
+    guard.is_medical_query("a")
+    guard.is_medical_query("b")
+    guard.is_medical_query("a")  # hit; "b" is now least recently used
+    guard.is_medical_query("c")  # evicts "b"
+    assert llm.calls == 3
+    
+    guard.is_medical_query("a")
+    assert llm.calls == 3
+    guard.is_medical_query("b")
+    assert llm.calls == 4
+
+
+def test_unparseable_verdict_is_allowed_and_not_cached():
+    llm = FakeLLM("I cannot tell")
+    guard = GuardService(llm, FakeEmbeddings({"hmm": np.ones(3)}))
+    
+    assert guard.is_medical_query("hmm") == (True, "Validation unparseable - allowing")
+    guard.is_medical_query("hmm")
+    assert llm.calls == 2
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from tools.knowledge_search import KnowledgeSearchTool
+
+
+class FakeKnowledgeService:
+    """Records searches; each search waits for `release` when set"""
+    
+    def __init__(self):
+        self.queries = []
+        self.started = threading.Event()
+        self.release = None
+    
+    def search(self, query):
+        self.queries.append(query)
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        return [{"score": 0.9, "source": "book.pdf", "text": f"about {query}"}]
+
+
+@pytest.fixture
+def service():
+    return FakeKnowledgeService()
+
+
+@pytest.fixture
+def tool(service):
+    return KnowledgeSearchTool(service)
+
+
+def test_prefetch_hit_reuses_search(tool, service):
+    tool.prefetch("Flu  Symptoms")
+    result = tool.execute("flu symptoms")
+    
+    assert service.queries == ["Flu  Symptoms"]
+    assert "about Flu  Symptoms" in result
+
+
+def test_prefetch_miss_searches_again(tool, service):
+    tool.prefetch("flu symptoms")
+    tool.execute("diabetes treatment")
+    
+    assert sorted(service.queries) == ["diabetes treatment", "flu symptoms"]
+
+
+def test_repeat_query_hits_cache(tool, service):
+    tool.execute("flu symptoms")
+    tool.execute("FLU symptoms ")
+    
+    assert service.queries == ["flu symptoms"]
+
+
+def test_discarded_prefetch_still_fills_cache(tool, service):
+    service.release = threading.Event()
+    tool.prefetch("flu symptoms")
+    assert service.started.wait(5)
+    tool.discard_prefetch("flu symptoms")
+    service.release.set()
+    tool._prefetch_pool.submit(lambda: None).result()
+    
+    tool.execute("flu symptoms")
+    assert service.queries == ["flu symptoms"]
+
+
+def test_discarded_prefetch_that_never_started_is_cancelled(tool, service):
+    service.release = threading.Event()
+    # Occupy both pool workers so the third prefetch stays queued
+    tool.prefetch("a")
+    tool.prefetch("b")
+    tool.prefetch("c")
+    tool.discard_prefetch("c")
+    service.release.set()
+    tool._prefetch_pool.shutdown(wait=True)
+    
+    assert "c" not in service.queries
+    assert tool._cache_get("c") is None
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from services.llm_service import LLMService
+
+
+@pytest.fixture
+def llm_service():
+    return LLMService()
+
+
+def run_concurrently(target, count):
+    results = [None] * count
+    
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def test_single_flight_shares_one_call(llm_service):
+    calls = []
+    release = threading.Event()
+    
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+    
+    threads, results = run_concurrently(lambda: llm_service._single_flight(b"key", call), 5)
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert llm_service._inflight == {}
+
+
+def test_single_flight_propagates_errors_to_waiters(llm_service):
+    release = threading.Event()
+    
+    def call():
+        release.wait(5)
+        raise RuntimeError("boom")
+    
+    threads, results = run_concurrently(lambda: llm_service._single_flight(b"key", call), 3)
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join(5)
+    
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert llm_service._inflight == {}
+
+
+def test_single_flight_runs_again_after_completion(llm_service):
+    calls = []
+    
+    def call():
+        calls.append(1)
+        return len(calls)
+    
+    assert llm_service._single_flight(b"key", call) == 1
+    assert llm_service._single_flight(b"key", call) == 2
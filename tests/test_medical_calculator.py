@@ -0,0 +1,55 @@
+import orjson
+import pytest
+
+from tools.medical_calculator import MedicalCalculatorTool
+
+
+@pytest.fixture
+def calculator():
+    return MedicalCalculatorTool()
+
+
+def batch_input(**parameters) -> str:
+    return orjson.dumps({"calculation_type": "BMI_BATCH", "parameters": parameters}).decode()
+
+
+def test_bmi_batch(calculator):
+    result = calculator.execute(batch_input(weights_kg=[70, 95, 50], heights_m=[1.75, 1.80, 1.70]))
+    
+    assert result.splitlines() == [
+        "index,bmi,category",
+        "0,22.9,Normal weight",
+        "1,29.3,Overweight",
+        "2,17.3,Underweight",
+    ]
+
+
+def test_bmi_batch_boundary_takes_upper_category(calculator):
+    result = calculator.execute(batch_input(weights_kg=[25], heights_m=[1]))
+    assert result.splitlines()[1] == "0,25.0,Overweight"
+
+
+def test_bmi_batch_accepts_legacy_pair(calculator):
+    result = calculator.execute("BMI_BATCH", '{"weights_kg": [70], "heights_m": [1.75]}')
+    assert result.splitlines()[1] == "0,22.9,Normal weight"
+
+
+@pytest.mark.parametrize("parameters", [
+    {"weights_kg": [70, 80], "heights_m": [1.75]},
+    {"weights_kg": [], "heights_m": []},
+    {"weights_kg": ["70"], "heights_m": [1.75]},
+    {"weights_kg": [True], "heights_m": [1.75]},
+    {"weights_kg": 70, "heights_m": 1.75},
+    {"heights_m": [1.75]},
+])
+def test_bmi_batch_rejects_malformed_lists(calculator, parameters):
+    assert calculator.execute(batch_input(**parameters)).startswith("BMI_BATCH requires equal-length")
+
+
+def test_bmi_batch_rejects_non_positive_values(calculator):
+    result = calculator.execute(batch_input(weights_kg=[70], heights_m=[0]))
+    assert result == "BMI_BATCH requires positive weights and heights"
+
+
+def test_invalid_json_returns_usage(calculator):
+    assert calculator.execute("BMI_BATCH").startswith("Invalid input")
@@ -0,0 +1,108 @@
+import pytest
+
+from agents.memory import ConversationMemory
+from config.settings import settings
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+    
+    def generate_text(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return "- compressed fact"
+
+
+def drain(memory: ConversationMemory):
+    """Wait for background compression to finish"""
+    memory._compressor.submit(lambda: None).result()
+
+
+def contents(memory: ConversationMemory):
+    return [msg.content for msg in memory.conversation_history]
+
+
+def test_without_llm_oldest_turns_are_dropped():
+    memory = ConversationMemory(max_history=2)
+    for i in range(3):
+        memory.add_exchange(f"q{i}", f"a{i}")
+    
+    assert contents(memory) == ["q1", "a1", "q2", "a2"]
+    assert memory.summary is None
+
+
+def test_compression_keeps_previous_turn_raw(monkeypatch):
+    monkeypatch.setattr(settings, "memory_compress_turns", 3)
+    llm = FakeLLM()
+    memory = ConversationMemory(max_history=3, llm_service=llm)
+    for i in range(4):
+        memory.add_exchange(f"q{i}", f"a{i}")
+    drain(memory)
+    
+    # Only two turns could be compressed: the previous one stays verbatim
+    assert contents(memory) == ["q2", "a2", "q3", "a3"]
+    assert [msg.content for msg in memory.archive] == ["q0", "a0", "q1", "a1"]
+    assert memory.summary.content == "- compressed fact"
+    assert memory.summary.metadata["compressed_messages"] == 4
+    assert "User: q0" in llm.prompts[0]
+    
+    context = memory.get_recent_context(n=3)
+    assert context.startswith("EARLIER CONVERSATION (summarized):\n- compressed fact")
+    assert "User: q3" in context
+
+
+def test_single_turn_history_still_compresses():
+    memory = ConversationMemory(max_history=1, llm_service=FakeLLM())
+    memory.add_exchange("q0", "a0")
+    memory.add_exchange("q1", "a1")
+    drain(memory)
+    
+    assert contents(memory) == ["q1", "a1"]
+    assert memory.summary is not None
+
+
+def test_archive_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "memory_archive_messages", 4)
+    memory = ConversationMemory(max_history=1, llm_service=FakeLLM())
+    for i in range(5):
+        memory.add_exchange(f"q{i}", f"a{i}")
+    drain(memory)
+    
+    assert [msg.content for msg in memory.archive] == ["q2", "a2", "q3", "a3"]
+
+
+def test_clear_history_discards_pending_work():
+    memory = ConversationMemory(max_history=2, llm_service=FakeLLM())
+    generation = memory.generation
+    memory.add_exchange("q0", "a0")
+    memory.clear_history()
+    
+    # A turn that started before the reset must not write back
+    memory.add_exchange("stale", "reply", generation=generation)
+    assert contents(memory) == []
+    
+    memory.add_exchange("q1", "a1", generation=memory.generation)
+    assert contents(memory) == ["q1", "a1"]
+    assert memory.summary is None
+    assert memory.get_recent_context() == "RECENT CONVERSATION CONTEXT:\n\nUser: q1\nAssistant: a1\n"
+
+
+def test_compression_finishing_after_clear_is_ignored():
+    memory = ConversationMemory(max_history=1, llm_service=FakeLLM())
+    memory.add_exchange("q0", "a0")
+    evicted = list(memory.conversation_history)
+    generation = memory.generation
+    memory.clear_history()
+    
+    memory._compress(evicted, generation)
+    assert memory.summary is None
+
+
+@pytest.mark.parametrize("text, limit, expected", [
+    ("short", 10, "short"),
+    ("hello world again", 8, "hello..."),
+    ("hello world", 5, "hello..."),
+])
+def test_truncate_at_word(text, limit, expected):
+    from agents.memory import truncate_at_word
+    assert truncate_at_word(text, limit) == expected
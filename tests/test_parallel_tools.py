@@ -0,0 +1,43 @@
+import pytest
+from langchain_core.tools import Tool
+
+from tools.parallel_tools import ParallelToolsTool
+
+
+def echo_tool(name):
+    return Tool(name=name, func=lambda text: f"{name}:{text}", description=name)
+
+
+@pytest.fixture
+def parallel():
+    return ParallelToolsTool([echo_tool("kb"), echo_tool("web")])
+
+
+def test_parse_calls_object(parallel):
+    calls = parallel._parse_calls('{"calls": [{"tool": "kb", "input": "flu"}, {"tool": "web", "input": "covid"}]}')
+    assert [(t.name, inp) for t, inp in calls] == [("kb", "flu"), ("web", "covid")]
+
+
+def test_parse_calls_bare_list(parallel):
+    calls = parallel._parse_calls('[{"tool": "kb"}]')
+    assert [(t.name, inp) for t, inp in calls] == [("kb", "")]
+
+
+@pytest.mark.parametrize("calls_json, message", [
+    ('{"calls": []}', "non-empty 'calls' list"),
+    ('{"tool": "kb"}', "non-empty 'calls' list"),
+    ('{"calls": [{"tool": "calculator"}]}', "Unknown tool 'calculator'"),
+])
+def test_parse_calls_rejects(parallel, calls_json, message):
+    with pytest.raises(ValueError, match=message):
+        parallel._parse_calls(calls_json)
+
+
+@pytest.mark.parametrize("calls_json", ["not json", '{"calls": ["kb"]}'])
+def test_execute_reports_invalid_input(parallel, calls_json):
+    assert parallel.execute(calls_json).startswith("Invalid parallel_tools input")
+
+
+def test_execute_labels_results(parallel):
+    result = parallel.execute('{"calls": [{"tool": "kb", "input": "flu"}, {"tool": "web", "input": "covid"}]}')
+    assert result == "[kb] Input: flu\nkb:flu\n\n---\n\n[web] Input: covid\nweb:covid\n"
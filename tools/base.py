@@ -1,5 +1,7 @@
+import inspect
 from abc import ABC, abstractmethod
 from typing import Any
+from langchain_core.tools import StructuredTool
 from loguru import logger
 
 
@@ -19,10 +21,19 @@ class BaseMedicalTool(ABC):
     def __call__(self, *args, **kwargs) -> str:
         """Make tool callable"""
         try:
-            logger.info(f"Executing tool: {self.name}")
+            logger.debug("Executing tool: {}", self.name)
             result = self.execute(*args, **kwargs)
-            logger.success(f"Tool {self.name} completed")
+            logger.debug("Tool {} completed", self.name)
             return result
         except Exception as e:
             logger.error(f"Tool {self.name} failed: {e}")
-            return f"Tool execution failed: {str(e)}"
\ No newline at end of file
+            return f"Tool execution failed: {str(e)}"
+    
+    def as_langchain_tool(self) -> StructuredTool:
+        """Wrap this instance as a LangChain tool (async too if aexecute exists)"""
+        return StructuredTool.from_function(
+            func=self.execute,
+            coroutine=getattr(self, "aexecute", None),
+            name=self.name,
+            description=inspect.cleandoc(self.description)
+        )
\ No newline at end of file
@@ -1,10 +1,21 @@
-from langchain_core.tools import tool
+import asyncio
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import StringIO
+from typing import Any, Dict, List, Optional
+import orjson
+from cachetools import LRUCache
 from loguru import logger
 
+from config.settings import settings
 from tools.base import BaseMedicalTool
 from services.knowledge_base import KnowledgeBaseService
 
 
+_WS_RE = re.compile(r"\s+")
+
+
 class KnowledgeSearchTool(BaseMedicalTool):
     """Search medical knowledge base"""
     
@@ -30,59 +41,188 @@ class KnowledgeSearchTool(BaseMedicalTool):
             """
         )
         self.knowledge_service = knowledge_service
+        
+        # Speculative searches started before the agent picks a tool
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kb-prefetch")
+        self._prefetched: Dict[str, Future] = {}
+        self._prefetch_lock = threading.Lock()
+        
+        # Results of earlier searches keyed by normalized query (corpus changes rarely)
+        self._result_cache: LRUCache = LRUCache(maxsize=settings.knowledge_cache_size)
+        self._cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return _WS_RE.sub(" ", query).strip().lower()
+    
+    def _cache_get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._cache_lock:
+            return self._result_cache.get(key)
+    
+    def _cache_set(self, key: str, results: List[Dict[str, Any]]):
+        with self._cache_lock:
+            self._result_cache[key] = results
+    
+    def prefetch(self, query: str):
+        """Start searching for query in the background so execute() can reuse it"""
+        key = self._normalize(query)
+        if self._cache_get(key) is not None:
+            return
+        with self._prefetch_lock:
+            if key not in self._prefetched:
+                self._prefetched[key] = self._prefetch_pool.submit(
+                    self.knowledge_service.search, query
+                )
+    
+    def discard_prefetch(self, query: str):
+        """Drop an unused speculative search, keeping its results if it runs"""
+        key = self._normalize(query)
+        with self._prefetch_lock:
+            future = self._prefetched.pop(key, None)
+        if future is None or future.cancel():
+            return
+        
+        def keep(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                self._cache_set(key, done.result())
+        
+        # Runs immediately if the search already finished
+        future.add_done_callback(keep)
+    
+    def _search(self, query: str) -> List[Dict[str, Any]]:
+        """Search, reusing cached results or a matching speculative search"""
+        key = self._normalize(query)
+        results = self._cache_get(key)
+        if results is not None:
+            logger.debug("Knowledge search cache hit")
+            return results
+        
+        with self._prefetch_lock:
+            future = self._prefetched.pop(key, None)
+        if future is not None:
+            logger.debug("Using prefetched knowledge base results")
+            results = future.result()
+        else:
+            results = self.knowledge_service.search(query)
+        
+        self._cache_set(key, results)
+        return results
+    
+    @staticmethod
+    def _format_results(results: List[Dict[str, Any]]) -> str:
+        """Render search results for the agent"""
+        if not results:
+            return "No relevant information found in knowledge base"
+        
+        buf = StringIO()
+        buf.write(f"Found {len(results)} results\n\n")
+        for i, result in enumerate(results, 1):
+            if i > 1:
+                buf.write("\n---\n\n")
+            buf.write(
+                f"Result {i} (Relevance: {result['score']:.2f})\n"
+                f"Source: {result['source']}\n{result['text']}\n"
+            )
+        return buf.getvalue()
     
     def execute(self, query: str) -> str:
         """Search knowledge base"""
         try:
-            results = self.knowledge_service.search(query)
+            return self._format_results(self._search(query))
             
-            if not results:
-                return "No relevant information found in knowledge base"
+        except Exception as e:
+            logger.error(f"Knowledge search error: {e}")
+            return f"Search error: {str(e)}"
+    
+    async def aexecute(self, query: str) -> str:
+        """Search knowledge base without blocking the event loop"""
+        return await asyncio.to_thread(self.execute, query)
+    
+    def execute_batch(self, queries: List[str]) -> List[str]:
+        """Search several queries with one embedding call and concurrent lookups"""
+        try:
+            keys = [self._normalize(q) for q in queries]
+            found = {}
+            for key in keys:
+                results = self._cache_get(key)
+                if results is not None:
+                    found[key] = results
             
-            # Format results
-            context_parts = []
-            for i, result in enumerate(results, 1):
-                score = result['score']
-                text = result['text']
-                source = result['source']
-                
-                context_parts.append(
-                    f"Result {i} (Relevance: {score:.2f})\n"
-                    f"Source: {source}\n{text}\n"
-                )
+            # One batched search for the distinct uncached queries
+            missing = {}
+            for key, query in zip(keys, queries):
+                if key not in found:
+                    missing.setdefault(key, query)
+            if missing:
+                batch_results = self.knowledge_service.search_batch(list(missing.values()))
+                for key, results in zip(missing, batch_results):
+                    found[key] = results
+                    self._cache_set(key, results)
             
-            header = f"Found {len(results)} results\n\n"
-            return header + "\n---\n\n".join(context_parts)
+            return [self._format_results(found[key]) for key in keys]
             
         except Exception as e:
-            logger.error(f"Knowledge search error: {e}")
-            return f"Search error: {str(e)}"
-
-
-# Global instance - will be set by agent
-_knowledge_tool_instance = None
-
+            logger.error(f"Knowledge batch search error: {e}")
+            return [f"Search error: {str(e)}"] * len(queries)
 
-def set_knowledge_tool(tool: KnowledgeSearchTool):
-    """Set the global knowledge tool instance"""
-    global _knowledge_tool_instance
-    _knowledge_tool_instance = tool
 
-
-# LangChain tool wrapper
-@tool
-def search_medical_knowledge(query: str) -> str:
-    """Search medical knowledge base for clinical information.
-    
-    Use this tool to search for medical definitions, disease information,
-    treatment protocols, clinical guidelines, and drug information.
-    
-    Args:
-        query: Medical question or topic to search for
-    
-    Returns:
-        Relevant medical literature with citations
-    """
-    if _knowledge_tool_instance is None:
-        return "Knowledge base tool not initialized"
-    return _knowledge_tool_instance.execute(query)
\ No newline at end of file
+class KnowledgeSearchBatchTool(BaseMedicalTool):
+    """Search medical knowledge base for several queries in one call"""
+    
+    def __init__(self, knowledge_tool: KnowledgeSearchTool):
+        """
+        Initialize batch knowledge search tool
+        
+        Args:
+            knowledge_tool: Single-query knowledge search tool to delegate to
+        """
+        super().__init__(
+            name="search_medical_knowledge_batch",
+            description="""Search medical knowledge base for several topics at once.
+            
+            Use when a question breaks into multiple independent medical
+            sub-questions (e.g. each condition in a differential).
+            
+            Args:
+                queries_json: JSON list of queries, e.g. ["psoriasis treatment", "eczema treatment"]
+                
+            Returns:
+                Results for each query, labelled by query
+            """
+        )
+        self.knowledge_tool = knowledge_tool
+    
+    @staticmethod
+    def _parse_queries(queries_json: str) -> List[str]:
+        queries = orjson.loads(queries_json)
+        if isinstance(queries, dict):
+            queries = queries.get("queries")
+        if not isinstance(queries, list) or not queries:
+            raise ValueError("Expected a non-empty JSON list of queries")
+        return [str(q) for q in queries]
+    
+    @staticmethod
+    def _format_batch(queries: List[str], outputs: List[str]) -> str:
+        return "\n===\n\n".join(
+            f"[Query: {query}]\n{output}" for query, output in zip(queries, outputs)
+        )
+    
+    def execute(self, queries_json: str) -> str:
+        """Run all queries as one batch"""
+        try:
+            queries = self._parse_queries(queries_json)
+        except (ValueError, AttributeError) as e:
+            return f"Invalid search_medical_knowledge_batch input: {str(e)}"
+        
+        return self._format_batch(queries, self.knowledge_tool.execute_batch(queries))
+    
+    async def aexecute(self, queries_json: str) -> str:
+        """Run all queries concurrently from the event loop"""
+        try:
+            queries = self._parse_queries(queries_json)
+        except (ValueError, AttributeError) as e:
+            return f"Invalid search_medical_knowledge_batch input: {str(e)}"
+        
+        return self._format_batch(
+            queries, await asyncio.to_thread(self.knowledge_tool.execute_batch, queries)
+        )
@@ -1,5 +1,7 @@
-import json
-from langchain_core.tools import tool
+import bisect
+from typing import Any, Optional, Tuple
+import numpy as np
+import orjson
 from loguru import logger
 
 from tools.base import BaseMedicalTool
@@ -8,42 +10,74 @@ from tools.base import BaseMedicalTool
 class MedicalCalculatorTool(BaseMedicalTool):
     """Calculate medical metrics and scores"""
     
+    # BMI category table: bounds are the lower edge of each category after the first
+    _BMI_BOUNDS = (18.5, 25.0, 30.0)
+    _BMI_LABELS = (
+        ("Underweight", "Increased risk of malnutrition"),
+        ("Normal weight", "Healthy weight range"),
+        ("Overweight", "Increased health risks"),
+        ("Obese", "Significant health risks"),
+    )
+    
     def __init__(self):
         """Initialize medical calculator"""
         super().__init__(
             name="calculate_medical_metric",
             description="""Calculate medical metrics and scores.
             
-            Supported: BMI, eGFR, APACHE II, CHADS2
+            Supported: BMI, BMI_BATCH, eGFR, APACHE II, CHADS2
             
             Args:
-                calculation_type: Type (e.g., "BMI")
-                parameters: JSON with required parameters
+                calculation: JSON with "calculation_type" and "parameters"
                 
             Example:
-                calculation_type="BMI"
-                parameters='{"weight_kg": 70, "height_m": 1.75}'
+                {"calculation_type": "BMI", "parameters": {"weight_kg": 70, "height_m": 1.75}}
+                
+                {"calculation_type": "BMI_BATCH",
+                 "parameters": {"weights_kg": [70, 95], "heights_m": [1.75, 1.80]}}
                 
             Returns:
                 Calculated value with interpretation
             """
         )
     
-    def execute(self, calculation_type: str, parameters: str) -> str:
+    @staticmethod
+    def _parse_input(calculation: str, parameters: Optional[str]) -> Tuple[str, Any]:
+        """Split the single JSON Action Input (or the legacy type + parameters pair)"""
+        if parameters is not None:
+            return calculation, orjson.loads(parameters)
+        
+        payload = orjson.loads(calculation)
+        if not isinstance(payload, dict) or "calculation_type" not in payload:
+            raise ValueError
+        params = payload.get("parameters", {})
+        if isinstance(params, str):
+            params = orjson.loads(params)
+        return str(payload["calculation_type"]), params
+    
+    def execute(self, calculation: str, parameters: Optional[str] = None) -> str:
         """Execute medical calculation"""
         try:
-            params = json.loads(parameters)
+            try:
+                calculation_type, params = self._parse_input(calculation, parameters)
+            except (ValueError, orjson.JSONDecodeError):
+                return (
+                    'Invalid input. Expected JSON like {"calculation_type": "BMI", '
+                    '"parameters": {"weight_kg": 70, "height_m": 1.75}}'
+                )
+            if not isinstance(params, dict):
+                return "'parameters' must be a JSON object"
             calc_type = calculation_type.upper()
             
             if calc_type == "BMI":
                 return self._calculate_bmi(params)
+            elif calc_type == "BMI_BATCH":
+                return self._calculate_bmi_batch(params)
             elif calc_type == "EGFR":
                 return self._calculate_egfr(params)
             else:
                 return f"Calculation '{calculation_type}' not supported"
                 
-        except json.JSONDecodeError:
-            return "Invalid JSON format for parameters"
         except Exception as e:
             logger.error(f"Calculation error: {e}")
             return f"Calculation failed: {str(e)}"
@@ -58,18 +92,9 @@ class MedicalCalculatorTool(BaseMedicalTool):
         
         bmi = weight / (height ** 2)
         
-        if bmi < 18.5:
-            category = "Underweight"
-            risk = "Increased risk of malnutrition"
-        elif bmi < 25:
-            category = "Normal weight"
-            risk = "Healthy weight range"
-        elif bmi < 30:
-            category = "Overweight"
-            risk = "Increased health risks"
-        else:
-            category = "Obese"
-            risk = "Significant health risks"
+        # bisect_right so a value on a bound falls in the upper category
+        idx = bisect.bisect_right(self._BMI_BOUNDS, bmi)
+        category, risk = self._BMI_LABELS[idx]
         
         return f"""BMI CALCULATION RESULT:
 
@@ -83,15 +108,50 @@ Reference Ranges:
 - Overweight: 25.0 - 29.9
 - Obese: ≥ 30.0"""
     
+    def _calculate_bmi_batch(self, params: dict) -> str:
+        """Calculate BMI for many patients at once (CSV output)"""
+        weights = params.get("weights_kg")
+        heights = params.get("heights_m")
+        
+        if not (self._is_number_list(weights) and self._is_number_list(heights)) \
+                or len(weights) != len(heights):
+            return (
+                "BMI_BATCH requires equal-length numeric lists 'weights_kg' and 'heights_m', "
+                'e.g. {"weights_kg": [70, 95], "heights_m": [1.75, 1.80]}'
+            )
+        
+        w = np.asarray(weights, dtype=np.float64)
+        h = np.asarray(heights, dtype=np.float64)
+        if (w <= 0).any() or (h <= 0).any():
+            return "BMI_BATCH requires positive weights and heights"
+        
+        bmis = w / h ** 2
+        # digitize matches bisect_right: a value on a bound takes the upper category
+        categories = np.digitize(bmis, self._BMI_BOUNDS)
+        
+        rows = ["index,bmi,category"]
+        rows.extend(
+            f"{i},{bmi:.1f},{self._BMI_LABELS[cat][0]}"
+            for i, (bmi, cat) in enumerate(zip(bmis.tolist(), categories.tolist()))
+        )
+        return "\n".join(rows)
+    
+    @staticmethod
+    def _is_number_list(values: Any) -> bool:
+        return (
+            isinstance(values, list) and bool(values)
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+        )
+    
     def _calculate_egfr(self, params: dict) -> str:
         """Calculate eGFR (simplified)"""
         # Implementation would go here
         return "eGFR calculation coming soon"
 
 
-# LangChain tool wrapper
-@tool
-def calculate_medical_metric(calculation_type: str, parameters: str) -> str:
-    """Calculate medical metrics and scores."""
-    tool_instance = MedicalCalculatorTool()
-    return tool_instance.execute(calculation_type, parameters)
\ No newline at end of file
+# Stateless, so one shared instance serves every call
+_calc_singleton = MedicalCalculatorTool()
+
+
+# LangChain tool (carries the full description, including BMI_BATCH)
+calculate_medical_metric = _calc_singleton.as_langchain_tool()
\ No newline at end of file
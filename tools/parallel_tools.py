@@ -0,0 +1,95 @@
+import asyncio
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+from langchain_core.tools import BaseTool
+from loguru import logger
+
+from tools.base import BaseMedicalTool
+
+
+class ParallelToolsTool(BaseMedicalTool):
+    """Run independent tool calls concurrently"""
+
+    def __init__(self, tools: List[BaseTool]):
+        """
+        Initialize parallel dispatch tool
+
+        Args:
+            tools: LangChain tools that may be dispatched in parallel
+        """
+        super().__init__(
+            name="parallel_tools",
+            description="""Run several independent tool calls at the same time.
+
+            Use when two or more lookups do not depend on each other's
+            results (e.g. knowledge base AND web search for one question).
+
+            Args:
+                calls_json: JSON like {"calls": [{"tool": "search_medical_knowledge",
+                    "input": "..."}, {"tool": "search_web_medical", "input": "..."}]}
+
+            Returns:
+                Each tool's result, labelled by tool name
+            """
+        )
+        self.tools = {t.name: t for t in tools}
+
+    def _parse_calls(self, calls_json: str) -> List[Tuple[BaseTool, Any]]:
+        """Parse and validate the requested calls"""
+        payload = orjson.loads(calls_json)
+        calls = payload.get("calls") if isinstance(payload, dict) else payload
+
+        if not isinstance(calls, list) or not calls:
+            raise ValueError("Expected a non-empty 'calls' list")
+
+        parsed = []
+        for call in calls:
+            tool_name = call.get("tool")
+            if tool_name not in self.tools:
+                raise ValueError(f"Unknown tool '{tool_name}'")
+            parsed.append((self.tools[tool_name], call.get("input", "")))
+        return parsed
+
+    def _format_results(self, calls: List[Tuple[BaseTool, Any]], results: List[Any]) -> str:
+        """Label each result with the call that produced it"""
+        parts = []
+        for (t, inp), result in zip(calls, results):
+            if isinstance(result, Exception):
+                result = f"Tool execution failed: {str(result)}"
+            parts.append(f"[{t.name}] Input: {inp}\n{result}\n")
+        return "\n---\n\n".join(parts)
+
+    def execute(self, calls_json: str) -> str:
+        """Run calls concurrently on a thread pool"""
+        try:
+            calls = self._parse_calls(calls_json)
+        except (ValueError, AttributeError) as e:
+            return f"Invalid parallel_tools input: {str(e)}"
+
+        logger.info(f"Dispatching {len(calls)} tool calls in parallel")
+
+        def run(call):
+            t, inp = call
+            try:
+                return t.invoke(inp)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            results = list(pool.map(run, calls))
+        return self._format_results(calls, results)
+
+    async def aexecute(self, calls_json: str) -> str:
+        """Run calls concurrently from the event loop"""
+        try:
+            calls = self._parse_calls(calls_json)
+        except (ValueError, AttributeError) as e:
+            return f"Invalid parallel_tools input: {str(e)}"
+
+        logger.info(f"Dispatching {len(calls)} tool calls in parallel")
+        results = await asyncio.gather(
+            *[asyncio.to_thread(t.invoke, inp) for t, inp in calls],
+            return_exceptions=True
+        )
+        return self._format_results(calls, results)
@@ -1,11 +1,47 @@
-from langchain_core.tools import tool
-from serpapi import GoogleSearch
+from typing import Any, Dict, Optional
+import re
+from cachetools import TTLCache
 from loguru import logger
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+import asyncio
 import os
+import threading
+import httpx
+import orjson
 
 from tools.base import BaseMedicalTool
 
 
+SERPAPI_URL = "https://serpapi.com/search.json"
+HTTP_TIMEOUT = 15
+
+_WS_RE = re.compile(r"\s+")
+_MED_SUFFIX = " medical"
+
+# Persistent HTTP/2 client: repeat searches reuse one TCP/TLS connection
+_HTTP_CLIENT = httpx.Client(http2=True, timeout=HTTP_TIMEOUT)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Gateway errors and dropped connections are worth retrying"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in (502, 503, 504)
+    return isinstance(exc, httpx.TransportError)
+
+
+# Retry transient SerpAPI failures with jittered exponential backoff
+_retry_transient = retry(
+    wait=wait_random_exponential(min=0.2, max=4),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_transient),
+    reraise=True
+)
+
+# Formatted results keyed by normalized query (SerpAPI is slow and rate-limited)
+_WEB_CACHE: TTLCache = TTLCache(maxsize=256, ttl=900)
+_WEB_CACHE_LOCK = threading.Lock()
+
+
 class WebSearchTool(BaseMedicalTool):
     """Search web for current medical information"""
     
@@ -26,39 +62,82 @@ class WebSearchTool(BaseMedicalTool):
             """
         )
     
+    @staticmethod
+    def _params(query: str) -> Dict[str, Any]:
+        return {
+            "q": query + _MED_SUFFIX,
+            "api_key": os.getenv("SERPAPI_KEY"),
+            "num": 5
+        }
+    
+    @staticmethod
+    def _format_results(results: Dict[str, Any]) -> str:
+        """Render SerpAPI organic results for the agent"""
+        if "organic_results" not in results or not results["organic_results"]:
+            return "No web results found"
+        
+        snippets = ["WEB SEARCH RESULTS:\n"]
+        
+        for i, result in enumerate(results["organic_results"][:5], 1):
+            title = result.get("title", "No title")
+            snippet = result.get("snippet", "No description")
+            link = result.get("link", "")
+            
+            snippets.append(f"{i}. **{title}**\n   {snippet}\n   🔗 {link}\n")
+        
+        return "\n".join(snippets)
+    
+    @staticmethod
+    def _cache_get(key: str) -> Optional[str]:
+        with _WEB_CACHE_LOCK:
+            return _WEB_CACHE.get(key)
+    
+    @staticmethod
+    def _cache_set(key: str, output: str):
+        with _WEB_CACHE_LOCK:
+            _WEB_CACHE[key] = output
+    
+    @_retry_transient
+    def _fetch(self, query: str) -> Dict[str, Any]:
+        response = _HTTP_CLIENT.get(SERPAPI_URL, params=self._params(query))
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
     def execute(self, query: str) -> str:
         """Execute web search"""
+        key = _WS_RE.sub(" ", query).strip().lower()
+        cached = self._cache_get(key)
+        if cached is not None:
+            logger.info("Web search cache hit")
+            return cached
+        
         try:
-            search = GoogleSearch({
-                "q": f"{query} medical",
-                "api_key": os.getenv("SERPAPI_KEY"),
-                "num": 5
-            })
-            results = search.get_dict()
-            
-            if "organic_results" not in results or not results["organic_results"]:
-                return "No web results found"
-            
-            # Format results
-            snippets = ["WEB SEARCH RESULTS:\n"]
-            
-            for i, result in enumerate(results["organic_results"][:5], 1):
-                title = result.get("title", "No title")
-                snippet = result.get("snippet", "No description")
-                link = result.get("link", "")
-                
-                snippets.append(f"{i}. **{title}**\n   {snippet}\n   🔗 {link}\n")
-            
-            return "\n".join(snippets)
-            
+            output = self._format_results(self._fetch(query))
+            self._cache_set(key, output)
+            return output
+        
+        # httpx error text embeds the request URL, which carries the API key
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            logger.error(f"Web search HTTP error: {status}")
+            return f"Web search error: HTTP {status}"
+        except httpx.RequestError as e:
+            logger.error(f"Web search request failed: {type(e).__name__}")
+            return f"Web search error: {type(e).__name__}"
         except Exception as e:
             logger.error(f"Web search error: {e}")
             return f"Web search error: {str(e)}"
+    
+    async def aexecute(self, query: str) -> str:
+        """Execute web search without blocking the event loop"""
+        # The agent runs each query on a fresh event loop, so a loop-bound async
+        # client would never be reused; the persistent sync client is
+        return await asyncio.to_thread(self.execute, query)
+
+
+# Stateless, so one shared instance serves every call
+_web_singleton = WebSearchTool()
 
 
-# LangChain tool wrapper
-@tool
-def search_web_medical(query: str) -> str:
-    """Search web for current medical information."""
-    tool_instance = WebSearchTool()
-    return tool_instance.execute(query)
\ No newline at end of file
+# LangChain tool (sync + async)
+search_web_medical = _web_singleton.as_langchain_tool()
\ No newline at end of file
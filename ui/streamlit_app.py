@@ -1,26 +1,150 @@
 import streamlit as st
+import ahocorasick
+from collections import deque
+from streamlit.errors import StreamlitAPIException
 from PIL import Image as PILImage
 from datetime import datetime
+from io import BytesIO
+from itertools import islice
 from loguru import logger
+import threading
+import time
+from types import SimpleNamespace
 from agents.medical_agent import MedicalAgent
 
 
-class StreamlitUI:
-    """Streamlit user interface - Professional Edition"""
-    
-    def __init__(self, agent: MedicalAgent):
-        """
-        Initialize Streamlit UI
-        
-        Args:
-            agent: Medical agent instance
+# Minimum spacing between script reruns triggered by this UI (seconds)
+RERUN_MIN_INTERVAL = 0.05
+
+# Streamed replies are pushed to the browser in batches of at least this
+# many characters, no more often than every STREAM_FLUSH_INTERVAL seconds
+STREAM_FLUSH_INTERVAL = 0.05
+STREAM_MIN_CHARS = 8
+
+# Longest the UI waits for an agent reply before recording an error (seconds)
+REPLY_TIMEOUT = 300
+
+IMAGE_KEYWORDS = ['image', 'x-ray', 'xray', 'scan', 'analyze', 'analyse', 'ct',
+                  'mri', 'radiograph', 'forearm', 'fracture']
+
+# Single-pass matcher for image wording (singular and plural forms)
+_IMG_AUTOMATON = ahocorasick.Automaton()
+for _kw in IMAGE_KEYWORDS:
+    _IMG_AUTOMATON.add_word(_kw, _kw)
+    _IMG_AUTOMATON.add_word(_kw + "s", _kw + "s")
+_IMG_AUTOMATON.make_automaton()
+
+
+def _is_image_query(text: str) -> bool:
+    """True if any image keyword appears as a whole word"""
+    text = text.lower()
+    for end, kw in _IMG_AUTOMATON.iter(text):
+        start = end - len(kw) + 1
+        if (start == 0 or not text[start - 1].isalnum()) and \
+                (end + 1 == len(text) or not text[end + 1].isalnum()):
+            return True
+    return False
+
+
+# Preview size kept in session state (the handler keeps the full-resolution image)
+THUMBNAIL_SIZE = (512, 512)
+PREVIEW_QUALITY = 80
+
+# Chat window: messages rendered per rerun, grown by "show earlier" clicks
+MAX_VISIBLE_MESSAGES = 30
+
+# Transcript cap kept in session state (oldest turns drop off)
+MAX_STORED_MESSAGES = 500
+
+
+def _hhmm() -> str:
+    """Current local time as HH:MM, without going through strftime"""
+    now = datetime.now()
+    return f"{now.hour:02d}:{now.minute:02d}"
+
+
+def _batched(stream):
+    """Coalesce a text stream into fewer, larger chunks"""
+    parts, size, last = [], 0, 0.0
+    for piece in stream:
+        parts.append(piece)
+        size += len(piece)
+        now = time.monotonic()
+        if size >= STREAM_MIN_CHARS and now - last >= STREAM_FLUSH_INTERVAL:
+            yield "".join(parts)
+            parts, size, last = [], 0, now
+    if parts:
+        yield "".join(parts)
+
+
+# Static page chrome; only the footer date is filled in per run
+_HEADER_HTML = """
+        <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                padding: 2rem; border-radius: 20px; margin-bottom: 2rem; 
+                box-shadow: 0 10px 30px rgba(0,0,0,0.2);'>
+             <h1 style='color: white; text-align: center; margin: 0;'>
+                 Medical AI Assistant
+             </h1>
+             <p style='color: rgba(255,255,255,0.9); text-align: center; 
+                  font-size: 1.1rem; margin-top: 0.5rem;'>
+            AI-powered medical consultation and image analysis
+        </p>
+    </div>
+    """
+
+_FOOTER_TMPL = """
+        <div style='text-align: center; padding: 2rem; background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); 
+                    border-radius: 16px; margin-top: 2rem;'>
+            <p style='color: #475569; font-size: 0.9rem; margin: 0.5rem 0;'>
+                <strong>⚕️ Medical Disclaimer:</strong> For educational purposes only
+            </p>
+            <p style='color: #475569; font-size: 0.9rem; margin: 0.5rem 0;'>
+                <strong>🤖 Powered by:</strong> Google Gemini Vision AI
+            </p>
+            <p style='color: #64748b; font-size: 0.85rem; margin: 0.5rem 0;'>
+                📅 Session: {date}
+            </p>
+        </div>
         """
-        self.agent = agent
-        self._add_custom_css()
-        self._initialize_session_state()
-    
-    def _add_custom_css(self):
-        st.markdown("""
+
+# Empty-chat welcome and sidebar help text
+_WELCOME_MSG = """
+**Welcome to Medical AI Assistant!**
+
+**I can help you with:**
+-  Medical conditions and symptoms
+-  Treatment options and medications
+-  Medical image analysis (X-rays, CT, MRI)
+-  Clinical guidelines and protocols
+-  Health calculations (BMI, etc.)
+
+**To analyze an image:**
+1. Upload your medical image in the sidebar →
+2. Wait for confirmation
+3. Click "Analyze" or ask your question
+
+**Example questions:**
+- "What are the symptoms of pneumonia?"
+- "Analyze this X-ray for fractures"
+- "What is the treatment for diabetes?"
+"""
+
+_SUPPORTED_TYPES_MD = """
+**Supported formats:**
+- PNG (.png)
+- JPEG (.jpg, .jpeg)
+- WebP (.webp)
+- BMP (.bmp)
+- DICOM (.dcm) *experimental*
+
+**Recommended:**
+- File size: < 10MB
+- Resolution: 512x512 or higher
+- Clear, high-contrast images
+"""
+
+# Static stylesheet, built once at import instead of on every rerun
+_CUSTOM_CSS = """
     <style>
         /* Full-width main container */
         .main .block-container {
@@ -172,37 +296,96 @@ class StreamlitUI:
             background: rgba(59, 130, 246, 0.1);
         }
     </style>
-    """, unsafe_allow_html=True)
+    """
+# Indentation/blank lines stripped so the payload re-sent on each full run is smaller
+_CUSTOM_CSS = "\n".join(line.strip() for line in _CUSTOM_CSS.splitlines() if line.strip())
+
+
+class StreamlitUI:
+    """Streamlit user interface - Professional Edition"""
+    
+    def __init__(self, agent: MedicalAgent):
+        """
+        Initialize Streamlit UI
+        
+        Args:
+            agent: Medical agent instance
+        """
+        self.agent = agent
+        self._rerun_scope = None
+        self._snapshot = None
+        self._add_custom_css()
+        self._initialize_session_state()
+    
+    def _add_custom_css(self):
+        # Emitted on every full run on purpose: Streamlit removes elements a run
+        # doesn't re-emit, so a once-per-session guard would drop the styles.
+        # Fragment reruns don't reach this.
+        st.markdown(_CUSTOM_CSS, unsafe_allow_html=True)
     
     def _initialize_session_state(self):
         """Initialize session state variables"""
         if 'messages' not in st.session_state:
-            st.session_state.messages = []
-        if 'uploaded_image' not in st.session_state:
-            st.session_state.uploaded_image = None
+            st.session_state.messages = deque(maxlen=MAX_STORED_MESSAGES)
+        if 'num_questions' not in st.session_state:
+            st.session_state.num_questions = 0
+        if 'image_bytes' not in st.session_state:
+            st.session_state.image_bytes = None
         if 'image_filename' not in st.session_state:
             st.session_state.image_filename = None
+        if 'visible_count' not in st.session_state:
+            st.session_state.visible_count = MAX_VISIBLE_MESSAGES
+        if 'pending_query' not in st.session_state:
+            st.session_state.pending_query = None
+        if 'inflight_turn' not in st.session_state:
+            st.session_state.inflight_turn = None
+    
+    def _request_rerun(self, scope: str = "app"):
+        """
+        Ask for a rerun once this run finishes (several requests coalesce into one)
+        
+        Args:
+            scope: "fragment" if only the calling fragment changed, "app" otherwise
+                (an "app" request wins over "fragment" ones)
+        """
+        if self._rerun_scope != "app":
+            self._rerun_scope = scope
+    
+    def _flush_rerun(self):
+        """Issue the coalesced rerun, spaced at least RERUN_MIN_INTERVAL after the previous one"""
+        scope = self._rerun_scope
+        if scope is None:
+            return
+        
+        # Fragment reruns replay this instance, so clear the request before leaving
+        self._rerun_scope = None
+        wait = RERUN_MIN_INTERVAL - (time.monotonic() - st.session_state.get("_last_rerun_ts", 0.0))
+        if wait > 0:
+            time.sleep(wait)
+        st.session_state._last_rerun_ts = time.monotonic()
+        try:
+            st.rerun(scope=scope)
+        except StreamlitAPIException:
+            # Fragment-scoped reruns are only legal during a fragment rerun
+            st.rerun()
     
     def _process_uploaded_image(self, uploaded_file) -> bool:
         """Process uploaded image file"""
         try:
             logger.info(f"Processing uploaded file: {uploaded_file.name}")
             
-            image = PILImage.open(uploaded_file)
-            logger.info(f"Image opened: {image.size}, {image.format}")
+            raw = uploaded_file.getvalue()
             
-            metadata = self.agent.image_handler.store_image(image, uploaded_file.name)
-            logger.info(f"✅ Image stored in handler: {uploaded_file.name}")
+            preview = self._decode_and_store(raw, uploaded_file.name)
             
-            has_pending = self.agent.image_handler.has_pending_image()
-            num_uploaded = len(self.agent.image_handler.uploaded_images)
-            logger.info(f"   Pending: {has_pending}, Total uploaded: {num_uploaded}")
+            snap = self._snapshot_state()
+            logger.debug("Pending: {}, Total uploaded: {}", snap.pending, snap.count)
             
-            if not has_pending:
+            if not snap.pending:
                 logger.error("❌ Image NOT in handler after storage!")
                 return False
             
-            st.session_state.uploaded_image = image
+            st.session_state.image_bytes = preview
             st.session_state.image_filename = uploaded_file.name
             
             logger.success(f"✅ Image processing complete: {uploaded_file.name}")
@@ -213,67 +396,127 @@ class StreamlitUI:
             st.error(f"Failed to process image: {e}")
             return False
     
-    def _send_message(self, user_message: str):
-        """Send message to agent"""
-        image_keywords = ['image', 'x-ray', 'scan', 'analyze', 'ct', 'mri', 'radiograph', 'xray', 'forearm', 'fracture']
-        is_image_query = any(keyword in user_message.lower() for keyword in image_keywords)
+    def _decode_and_store(self, raw: bytes, filename: str) -> bytes:
+        """Hand the image to the agent and return WEBP preview bytes"""
+        # Full-resolution image stays lazy (header only) until analysis decodes it
+        image = PILImage.open(BytesIO(raw))
+        logger.debug("Image opened: {}, {}", image.size, image.format)
+        
+        # Small preview for the sidebar; draft() lets JPEG decode at reduced scale
+        thumb = PILImage.open(BytesIO(raw))
+        thumb.draft("RGB", THUMBNAIL_SIZE)
+        thumb.thumbnail(THUMBNAIL_SIZE)
+        if thumb.mode not in ("RGB", "RGBA"):
+            thumb = thumb.convert("RGBA" if thumb.has_transparency_data else "RGB")
+        
+        # Encoded once here so st.image doesn't re-encode a PIL image every rerun
+        buf = BytesIO()
+        thumb.save(buf, format="WEBP", quality=PREVIEW_QUALITY)
+        
+        self.agent.image_handler.store_image(image, filename, raw)
+        logger.debug("Image stored in handler: {}", filename)
+        return buf.getvalue()
+    
+    def _append_user_turn(self, user_message: str) -> dict:
+        """Record the user's turn immediately (no agent call); returns the message"""
+        is_image_query = _is_image_query(user_message)
         
-        has_pending = self.agent.image_handler.has_pending_image()
-        num_uploaded = len(self.agent.image_handler.uploaded_images)
-        uploaded_keys = list(self.agent.image_handler.uploaded_images.keys())
+        snap = self._snapshot or self._snapshot_state()
         
-        logger.info(f"=== SENDING MESSAGE ===")
         logger.info(f"Query: {user_message[:50]}...")
-        logger.info(f"Is image query: {is_image_query}")
-        logger.info(f"Has pending image: {has_pending}")
-        logger.info(f"Uploaded count: {num_uploaded}")
-        logger.info(f"Uploaded keys: {uploaded_keys}")
-        logger.info(f"=====================")
-        
-        st.session_state.messages.append({
+        logger.debug("Is image query: {}", is_image_query)
+        logger.opt(lazy=True).debug(
+            "Has pending image: {}, Uploaded: {} ({})",
+            lambda: snap.pending,
+            lambda: snap.count,
+            lambda: ",".join(snap.keys)
+        )
+        
+        ts = _hhmm()
+        user_turn = {
             "role": "user",
             "content": user_message,
-            "timestamp": datetime.now().strftime("%H:%M")
-        })
+            "timestamp": ts,
+            "avatar": "👤",
+            "caption": ts
+        }
+        st.session_state.messages.append(user_turn)
+        st.session_state.num_questions += 1
+        return user_turn
+    
+    def _resolve_assistant_turn(self, user_message: str, container):
+        """
+        Run the agent for a recorded user turn, streaming the reply
         
-        result = self.agent.query(user_message)
+        Args:
+            user_message: User's question (already appended)
+            container: Chat container to stream the reply into
+        """
+        # The agent's worker thread parks the result in session state, so a
+        # rerun that interrupts the stream doesn't lose the reply
+        turn = SimpleNamespace(result=None, done=threading.Event())
+        st.session_state.inflight_turn = turn
+        
+        def finish(result):
+            turn.result = result
+            turn.done.set()
+        
+        with container:
+            with st.chat_message("assistant", avatar="🤖"):
+                st.write_stream(_batched(
+                    self.agent.stream_query(user_message, on_result=finish)
+                ))
+        self._store_assistant_turn()
+    
+    def _store_assistant_turn(self):
+        """Append the in-flight reply to the transcript (waits for the agent if needed)"""
+        turn = st.session_state.inflight_turn
+        finished = turn.done.wait(timeout=REPLY_TIMEOUT)
+        st.session_state.inflight_turn = None
+        if finished:
+            result = turn.result
+        else:
+            logger.error(f"No agent reply after {REPLY_TIMEOUT}s")
+            result = SimpleNamespace(
+                response="⚠️ The assistant did not respond in time. Please try again.",
+                tools_used=[]
+            )
         
+        ts = _hhmm()
+        caption = f"{ts} • 🔧 {', '.join(result.tools_used)}" if result.tools_used else ts
         st.session_state.messages.append({
             "role": "assistant",
             "content": result.response,
             "tools": result.tools_used,
-            "timestamp": datetime.now().strftime("%H:%M")
+            "timestamp": ts,
+            "avatar": "🤖",
+            "caption": caption
         })
         
         logger.info(f"Response received. Tools used: {result.tools_used}")
+        self._snapshot = None
     
     def render(self):
-        st.markdown("""
-        <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                padding: 2rem; border-radius: 20px; margin-bottom: 2rem; 
-                box-shadow: 0 10px 30px rgba(0,0,0,0.2);'>
-             <h1 style='color: white; text-align: center; margin: 0;'>
-                 Medical AI Assistant
-             </h1>
-             <p style='color: rgba(255,255,255,0.9); text-align: center; 
-                  font-size: 1.1rem; margin-top: 0.5rem;'>
-            AI-powered medical consultation and image analysis
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+        st.markdown(_HEADER_HTML, unsafe_allow_html=True)
+        self._snapshot_state()
+    
+        # One column split per run; Reset sits at the top of the sidebar column
+        chat_col, sidebar_col = st.columns([7, 3])
     
-    # Reset button
-        col1, col2, col3 = st.columns([8, 1, 1])
-        with col3:
+        # Reset button (handled before the chat renders, as when it had its own row)
+        with sidebar_col:
             if st.button("🔄 Reset", use_container_width=True, type="secondary"):
-                st.session_state.messages = []
-                st.session_state.uploaded_image = None
+                st.session_state.messages = deque(maxlen=MAX_STORED_MESSAGES)
+                st.session_state.num_questions = 0
+                st.session_state.image_bytes = None
                 st.session_state.image_filename = None
+                st.session_state.visible_count = MAX_VISIBLE_MESSAGES
+                st.session_state.pending_query = None
+                st.session_state.inflight_turn = None
                 self.agent.clear_conversation()
                 self.agent.image_handler.clear_all()
-                st.rerun()
-    
-        chat_col, sidebar_col = st.columns([7, 3])
+                self._snapshot = None
+                self._request_rerun()
     
         with chat_col:
             self._render_chat_interface()
@@ -282,67 +525,95 @@ class StreamlitUI:
             self._render_sidebar()
     
         self._render_footer()
+        self._flush_rerun()
+    
+    def _snapshot_state(self):
+        """Read image-handler and agent state once; rendering and logging reuse it"""
+        handler = self.agent.image_handler
+        try:
+            stats = self.agent.get_statistics()
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            stats = None
+        
+        self._snapshot = SimpleNamespace(
+            pending=handler.has_pending_image(),
+            count=len(handler.uploaded_images),
+            keys=tuple(handler.uploaded_images),
+            stats=stats
+        )
+        return self._snapshot
     
+    @st.fragment
     def _render_chat_interface(self):
-        """Render chat interface - IMPROVED"""
+        """Render chat interface - IMPROVED (fragment: reruns on its own)"""
         
         st.markdown("### Conversation")
         
         # Larger chat container
         chat_container = st.container(height=750)
         
+        # A reply whose stream was cut short by a rerun is still owed to the transcript
+        if st.session_state.inflight_turn is not None:
+            with st.spinner("Finishing previous answer..."):
+                self._store_assistant_turn()
+        
         with chat_container:
             if not st.session_state.messages:
-                st.info("""
-                 **Welcome to Medical AI Assistant!**
-                
-                **I can help you with:**
-                -  Medical conditions and symptoms
-                -  Treatment options and medications
-                -  Medical image analysis (X-rays, CT, MRI)
-                -  Clinical guidelines and protocols
-                -  Health calculations (BMI, etc.)
-                
-                **To analyze an image:**
-                1. Upload your medical image in the sidebar →
-                2. Wait for confirmation 
-                3. Click "Analyze" or ask your question
-                
-                **Example questions:**
-                - "What are the symptoms of pneumonia?"
-                - "Analyze this X-ray for fractures"
-                - "What is the treatment for diabetes?"
-                """)
+                st.info(_WELCOME_MSG)
             
-            for msg in st.session_state.messages:
-                with st.chat_message(msg["role"], avatar="👤" if msg["role"] == "user" else "🤖"):
-                    st.markdown(msg["content"])
-                    
-                    info_parts = [f"{msg.get('timestamp', '')}"]
-                    if "tools" in msg and msg["tools"]:
-                        info_parts.append(f"🔧 {', '.join(msg['tools'])}")
-                    
-                    if info_parts:
-                        st.caption(" • ".join(info_parts))
+            # Only the most recent window is rendered; older turns load on demand
+            messages = st.session_state.messages
+            hidden = len(messages) - st.session_state.visible_count
+            if hidden > 0:
+                if st.button(f"⬆️ Show earlier messages ({hidden} hidden)", key="show_earlier_btn"):
+                    st.session_state.visible_count += MAX_VISIBLE_MESSAGES
+                    self._request_rerun(scope="fragment")
+                messages = islice(messages, hidden, None)
+            
+            for msg in messages:
+                self._render_message(msg)
         
         st.divider()
         
         user_input = st.chat_input("Type your medical question here...", key="main_chat_input")
         
         if user_input:
+            # Echo the turn right away; the answer streams in below it
+            with chat_container:
+                self._render_message(self._append_user_turn(user_input))
+            st.session_state.pending_query = user_input
+        
+        # Turns queued here or by the sidebar's Analyze button
+        pending = st.session_state.pending_query
+        if pending is not None:
+            st.session_state.pending_query = None
             with st.spinner("Analyzing your question..."):
-                self._send_message(user_input)
-            st.rerun()
+                self._resolve_assistant_turn(pending, chat_container)
+            # Sidebar statistics and image state change too
+            self._request_rerun()
+        
+        self._flush_rerun()
+    
+    def _render_message(self, msg: dict):
+        """Render one chat message (avatar/caption precomputed at append time)"""
+        with st.chat_message(msg["role"], avatar=msg["avatar"]):
+            st.markdown(msg["content"])
+            st.caption(msg["caption"])
     
+    @st.fragment
     def _render_sidebar(self):
-        """Render sidebar - REDESIGNED"""
+        """Render sidebar - REDESIGNED (fragment: reruns on its own)"""
+        
+        # Fragment reruns skip render(); refresh only if something changed state
+        snap = self._snapshot or self._snapshot_state()
         
         st.markdown("### 📤 Upload Medical Image")
         
-        if st.session_state.get('uploaded_image') is not None:
+        if st.session_state.get('image_bytes') is not None:
             st.success(f"✅ **{st.session_state.image_filename}**")
             
-            if self.agent.image_handler.has_pending_image():
+            if snap.pending:
                 st.success("🟢 **Ready for Analysis**")
             else:
                 st.error("🔴 **System Error** - Please re-upload")
@@ -350,7 +621,7 @@ class StreamlitUI:
             # Display image in a nice container
             st.markdown('<div class="image-container">', unsafe_allow_html=True)
             st.image(
-                st.session_state.uploaded_image,
+                st.session_state.image_bytes,
                 use_container_width=True,
                 caption=f"📷 {st.session_state.image_filename}"
             )
@@ -364,18 +635,20 @@ class StreamlitUI:
             with col1:
                 if st.button("🔬 **Analyze**", use_container_width=True, type="primary", key="analyze_btn"):
                     quick_query = "Provide a detailed radiological analysis of this medical image, identifying any abnormalities, fractures, or noteworthy features"
-                    logger.info(f"Quick analyze clicked. Has pending: {self.agent.image_handler.has_pending_image()}")
-                    with st.spinner("🔍 Analyzing image..."):
-                        self._send_message(quick_query)
-                    st.rerun()
+                    logger.info(f"Quick analyze clicked. Has pending: {snap.pending}")
+                    # Show the request in the chat now; the chat resolves it on the rerun
+                    self._append_user_turn(quick_query)
+                    st.session_state.pending_query = quick_query
+                    self._request_rerun()
             
             with col2:
                 if st.button("🗑️ **Clear**", use_container_width=True, type="secondary", key="clear_btn"):
-                    st.session_state.uploaded_image = None
+                    st.session_state.image_bytes = None
                     st.session_state.image_filename = None
                     self.agent.image_handler.clear_all()
+                    self._snapshot = None
                     logger.info("Cleared all images")
-                    st.rerun()
+                    self._request_rerun(scope="fragment")
             
         else:
             # ============================================================
@@ -398,26 +671,13 @@ class StreamlitUI:
                     success = self._process_uploaded_image(uploaded_file)
                     if success:
                         logger.info("Image processed successfully")
-                        st.balloons()  # Fun animation!
-                        st.rerun()
+                        self._request_rerun(scope="fragment")
                     else:
                         st.error("❌ Failed to process. Please try again.")
             
             # Help section
             with st.expander("ℹ️ Supported Image Types"):
-                st.markdown("""
-                **Supported formats:**
-                - PNG (.png)
-                - JPEG (.jpg, .jpeg)
-                - WebP (.webp)
-                - BMP (.bmp)
-                - DICOM (.dcm) *experimental*
-                
-                **Recommended:**
-                - File size: < 10MB
-                - Resolution: 512x512 or higher
-                - Clear, high-contrast images
-                """)
+                st.markdown(_SUPPORTED_TYPES_MD)
         
         st.divider()
         
@@ -428,7 +688,7 @@ class StreamlitUI:
         st.markdown("### 📊 Session Statistics")
         
         num_messages = len(st.session_state.messages)
-        num_questions = sum(1 for m in st.session_state.messages if m["role"] == "user")
+        num_questions = st.session_state.num_questions
         
         col1, col2 = st.columns(2)
         
@@ -446,16 +706,15 @@ class StreamlitUI:
                 delta=None
             )
         
-        try:
-            stats = self.agent.get_statistics()
-            st.caption(f"📝 {stats['memory_summary']}")
+        if snap.stats is not None:
+            st.caption(f"📝 {snap.stats['memory_summary']}")
             
-            if self.agent.image_handler.has_pending_image():
+            if snap.pending:
                 st.success("🟢 Image Ready")
             else:
                 st.info("⚪ No Image")
-        except Exception as e:
-            logger.error(f"Error getting stats: {e}")
+        
+        self._flush_rerun()
     
     def _render_footer(self):
         """Render professional footer"""
@@ -463,20 +722,7 @@ class StreamlitUI:
         st.divider() 
         current_date = datetime.now().strftime('%B %d, %Y')
         
-        st.markdown("""
-        <div style='text-align: center; padding: 2rem; background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); 
-                    border-radius: 16px; margin-top: 2rem;'>
-            <p style='color: #475569; font-size: 0.9rem; margin: 0.5rem 0;'>
-                <strong>⚕️ Medical Disclaimer:</strong> For educational purposes only
-            </p>
-            <p style='color: #475569; font-size: 0.9rem; margin: 0.5rem 0;'>
-                <strong>🤖 Powered by:</strong> Google Gemini Vision AI
-            </p>
-            <p style='color: #64748b; font-size: 0.85rem; margin: 0.5rem 0;'>
-                📅 Session: {current_date}
-            </p>
-        </div>
-        """,unsafe_allow_html=True)
+        st.markdown(_FOOTER_TMPL.format(date=current_date), unsafe_allow_html=True)
         
         with st.expander("⚠️ **Important Medical Disclaimer**"):
             st.warning("""